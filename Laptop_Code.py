@@ -1,9 +1,21 @@
-import customtkinter as ctk
+from startup import StartupTimer
+STARTUP = StartupTimer("laptop")
+
+with STARTUP.importing("customtkinter"):
+    import customtkinter as ctk
 import time
 import threading
 import socket
-from ultralytics import YOLO
-import cv2
+import math
+import importlib.util
+with STARTUP.importing("app modules"):
+    from actuation import ActuationEngine
+    from capacity import CapacitySampler, RemoteCapacity
+    from ranging import EchoRanger, RpiGpio, SimulatedGpio
+    from pipeline import DetectionPipeline, MultiCamera
+    from forecast import format_eta
+    from protocol import RaspberryLink, command, ACK
+    from metrics import start_metrics_server
 
 # ================= GLOBAL THEME =================
 ctk.set_appearance_mode("light")
@@ -16,36 +28,47 @@ try:
 except ImportError:
     GPIO_AVAILABLE = False
 
-# ===================== YOLO IMPORT =====================
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-except ImportError:
-    YOLO_AVAILABLE = False
-
-try:
-    import cv2
-    from PIL import Image, ImageTk
-    CV2_AVAILABLE = True
-except ImportError:
-    CV2_AVAILABLE = False
+# ===================== LAZY VISION IMPORTS =====================
+# torch/ultralytics, OpenCV, NumPy dan PIL tidak diimport saat start
+# supaya Home langsung tampil. load_vision() dipanggil preloader di
+# background setelah window muncul, atau oleh CameraPage kalau tab
+# kamera dibuka sebelum preload selesai (menunggu lock yang sama).
+YOLO_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+CV2_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ("cv2", "numpy", "PIL"))
+VISION_LOCK = threading.Lock()
+VISION_LOADED = False
+
+def load_vision():
+    global cv2, np, Image, ImageTk, DisplayBuffer, TrackManager, VISION_LOADED
+    global MODELS, DEFAULT_MODEL, WASTE_MAP, MotionGate, WasteDetector, load_rois, save_rois, roi_to_pixels
+    global FrameRecorder
+    with VISION_LOCK:
+        if VISION_LOADED:
+            return
+        with STARTUP.importing("numpy"):
+            import numpy as np
+        with STARTUP.importing("cv2"):
+            import cv2
+        with STARTUP.importing("PIL"):
+            from PIL import Image, ImageTk
+        with STARTUP.importing("vision modules"):
+            from framebuf import DisplayBuffer
+            from recorder import FrameRecorder
+            from tracking import TrackManager
+            from detection import (MODELS, DEFAULT_MODEL, WASTE_MAP, MotionGate, WasteDetector,
+                                   load_rois, save_rois, roi_to_pixels)
+        VISION_LOADED = True
+        STARTUP.mark("vision imports ready")
+
+def inference_dynamic():
+    # ROI tersimpan -> crop dijalankan pada imgsz lebih kecil, jadi model
+    # ONNX/OpenVINO perlu export dinamis. Dibaca saat model dimuat: ROI yang
+    # baru digambar memakai imgsz penuh sampai aplikasi dibuka ulang.
+    return True if load_rois(ROI_FILE) else None
 
 # ===================== WASTE MAPPING =====================
-B3_ITEMS = [
-    "cell phone", "laptop", "remote", "tv", "mouse", "refrigerator"
-]
-WASTE_MAP = {
-    "ORGANIK": [
-        "banana", "apple", "orange", "broccoli", "carrot",
-        "sandwich", "hot dog", "pizza", "donut", "cake"
-    ],
-    "B3": B3_ITEMS,
-    "ANORGANIK": [
-        "bottle", "cup", "fork", "spoon", "knife", "scissors",
-        "toothbrush", "keyboard", "microwave", "oven",
-        "toaster", "clock", "vase"
-    ]
-}
+# Pemetaan kelas -> kategori ada di detection.WASTE_MAP (dipakai juga
+# oleh daemon.py); di sini hanya warna tampilan.
 WASTE_COLOR = {
     "ORGANIK": (0, 165, 255),   # ORANGE
     "ANORGANIK": (0, 255, 0),   # GREEN
@@ -53,6 +76,71 @@ WASTE_COLOR = {
     "NON": (120, 120, 120)
 }
 
+# ===================== DETECTION CONFIG =====================
+CONF_THRESHOLD = 0.5
+# Threshold khusus per kelas, contoh: {"cell phone": 0.6}
+CLASS_CONF = {}
+
+# Backend inferensi CPU: "ultralytics", "onnx", atau "openvino".
+# Bandingkan latensinya dengan: python backends.py --source 0
+INFERENCE_BACKEND = "ultralytics"
+INFERENCE_IMGSZ = 640
+INFERENCE_THREADS = None   # None = otomatis
+
+# Sumber kamera: index webcam atau URL stream. Lebih dari satu kamera
+# akan diproses sebagai satu batch dan hasilnya digabung.
+CAMERA_SOURCES = [0]
+
+# Motion gate: YOLO hanya jalan kalau ada perubahan di drop zone.
+# MOTION_THRESHOLD = porsi piksel yang berubah, MOTION_COOLDOWN = detik
+# YOLO tetap jalan setelah gerakan terakhir.
+MOTION_GATE = True
+MOTION_THRESHOLD = 0.01
+MOTION_PIXEL_DELTA = 25
+MOTION_COOLDOWN = 1.5
+
+# Tracker: item baru dikirim (BUKA) sekali setelah terlihat konsisten di
+# CONFIRM_FRAMES frame. Di antara refresh full frame setiap
+# TRACK_REFRESH_EVERY frame, YOLO hanya dijalankan di area track aktif.
+TRACKING = True
+CONFIRM_FRAMES = 3
+TRACK_REFRESH_EVERY = 5
+
+# Region of interest (area drop zone) per kamera, diatur lewat tombol
+# ATUR ROI di halaman Camera atau langsung di file ini. Kosong = full frame.
+ROI_FILE = "roi.json"
+
+# Antrian perintah saat Raspberry Pi terputus: maksimal COMMAND_QUEUE_SIZE
+# perintah, dan perintah yang lebih tua dari COMMAND_MAX_AGE detik dibuang
+# (item sudah lama lewat, tidak perlu membuka tutup lagi).
+COMMAND_QUEUE_SIZE = 16
+COMMAND_MAX_AGE = 10
+
+# Level isi bak dikirim Raspberry Pi (push) lewat koneksi yang sama,
+# hanya kalau bergeser >= CAPACITY_PUSH_THRESHOLD persen.
+CAPACITY_PUSH_THRESHOLD = 1.0
+
+# Rekam frame + metadata deteksi untuk dataset (lihat recorder.py).
+# RECORD_MODE: "detections" (saat ada deteksi), "sample" (tiap
+# RECORD_SAMPLE_EVERY detik), atau "both". Penulisan di thread sendiri;
+# kalau disk tidak mengejar, frame rekaman dibuang, bukan deteksinya.
+RECORD_ENABLED = False
+RECORD_DIR = "recordings"
+RECORD_MODE = "detections"
+RECORD_SAMPLE_EVERY = 2.0
+RECORD_RAW = True
+RECORD_ANNOTATED = False
+RECORD_MAX_MB = 2048
+
+# Batas frame yang ditampilkan di Tk. Deteksi tetap jalan secepat kamera;
+# frame di antaranya tidak di-render sama sekali.
+DISPLAY_FPS = 20
+
+# Endpoint Prometheus (lihat metrics.py): latensi per stage, inferensi,
+# socket, servo dan sensor. None = tidak dijalankan.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9101
+
 # ================= SERVO CONTROLLER =================
 class LidController:
     SERVO_PINS = {
@@ -101,35 +189,25 @@ class CapacityMonitor:
     TINGGI_BAK = 25   # cm
 
     def __init__(self):
+        # Echo diukur lewat callback tepi GPIO (lihat ranging.py); tanpa
+        # Raspberry Pi dipakai sensor simulasi dengan jalur kode yang sama
         if GPIO_AVAILABLE:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-            for u in self.ULTRASONIC.values():
-                GPIO.setup(u["trig"], GPIO.OUT)
-                GPIO.setup(u["echo"], GPIO.IN)
-                GPIO.output(u["trig"], False)
+            self.gpio = RpiGpio(GPIO)
+        else:
+            self.gpio = SimulatedGpio()
+        self.rangers = {}
+        for jenis, u in self.ULTRASONIC.items():
+            if not GPIO_AVAILABLE:
+                self.gpio.attach(u["trig"], u["echo"], lambda: 5 + (time.time() % 20))
+            self.rangers[jenis] = EchoRanger(self.gpio, u["trig"], u["echo"])
 
-    def get_distance(self, trig, echo):
-        if not GPIO_AVAILABLE:
-            return round(5 + (time.time() % 20), 1)
-        GPIO.output(trig, True)
-        time.sleep(0.00001)
-        GPIO.output(trig, False)
-        start = time.time()
-        while GPIO.input(echo) == 0:
-            if time.time() - start > 0.03:
-                return None
-        t1 = time.time()
-        while GPIO.input(echo) == 1:
-            if time.time() - t1 > 0.03:
-                return None
-        t2 = time.time()
-        return round((t2 - t1) * 17150, 1)
+    def get_distance(self, jenis):
+        return self.rangers[jenis].measure()
 
     def read_all(self):
         data = {}
-        for jenis, u in self.ULTRASONIC.items():
-            data[jenis] = self.get_distance(u["trig"], u["echo"])
+        for jenis in self.ULTRASONIC:
+            data[jenis] = self.get_distance(jenis)
         return data
 
     def get_percentage(self, distance):
@@ -222,8 +300,16 @@ class LidPage(ctk.CTkFrame):
         self.pack(fill="both", expand=True)
         if not hasattr(self.app, "lid_controller"):
             self.app.lid_controller = LidController()
+        if not hasattr(self.app, "actuator"):
+            self.app.actuator = ActuationEngine(self.app.lid_controller)
+        self.status_labels = {}
         self.build_ui()
 
+    def activate(self):
+        # Tutup bisa berubah saat halaman tersembunyi (auto close, perintah Pi)
+        for jenis, label in self.status_labels.items():
+            label.configure(text=f"Status: {self.app.lid_controller.status[jenis].upper()}")
+
     def build_ui(self):
         main = ctk.CTkFrame(self, fg_color="#66bb6a")
         main.pack(fill="both", expand=True)
@@ -243,6 +329,7 @@ class LidPage(ctk.CTkFrame):
         ctk.CTkLabel(card, text=title, font=("Segoe UI", 18, "bold"), text_color=color).pack(pady=15)
         status_label = ctk.CTkLabel(card, text="Status: TUTUP", font=("Segoe UI", 14), text_color="#424242")
         status_label.pack(pady=5)
+        self.status_labels[key] = status_label
         slider = ctk.CTkSlider(card, from_=0, to=100, width=220, command=lambda v: self.on_slider(key, v))
         slider.set(20)
         slider.pack(pady=15)
@@ -252,16 +339,17 @@ class LidPage(ctk.CTkFrame):
         ctk.CTkButton(btn_frame, text="TUTUP", fg_color="#e53935", width=90, command=lambda: self.close_lid(key, status_label, slider)).pack(side="left", padx=8)
 
     def on_slider(self, jenis, value):
-        self.app.lid_controller.set_angle(jenis, value)
+        # Tidak blok UI: servo digerakkan oleh worker bak tersebut
+        self.app.actuator.set_angle(jenis, value)
 
     def open_lid(self, jenis, label, slider):
         slider.set(80)
-        self.app.lid_controller.buka(jenis)
+        self.app.actuator.buka(jenis)
         label.configure(text="Status: BUKA")
 
     def close_lid(self, jenis, label, slider):
         slider.set(20)
-        self.app.lid_controller.tutup(jenis)
+        self.app.actuator.tutup(jenis)
         label.configure(text="Status: TUTUP")
 
 class CapacityPage(ctk.CTkFrame):
@@ -269,25 +357,49 @@ class CapacityPage(ctk.CTkFrame):
         super().__init__(parent)
         self.app = app
         self.pack(fill="both", expand=True)
-        self.monitor = CapacityMonitor()
+        # Sensor ultrasonik ada di Raspberry Pi: kartu dirender dari push
+        # CAPACITY Pi. Hanya kalau laptop ini sendiri punya GPIO, sensor
+        # dibaca langsung (monitor + sampler disimpan di app karena callback
+        # tepi echo hanya boleh didaftarkan sekali).
+        self.remote = not GPIO_AVAILABLE
+        if self.remote:
+            self.app.ensure_link()
+            self.sampler = self.app.remote_capacity
+        else:
+            if not hasattr(self.app, "capacity"):
+                self.app.capacity_monitor = CapacityMonitor()
+                self.app.capacity = CapacitySampler(self.app.capacity_monitor)
+                self.app.capacity.start()
+            self.sampler = self.app.capacity
         self.cards = {}
+        self.after_id = None
         self.build_ui()
+
+    def activate(self):
         self.update_data()
 
+    def deactivate(self):
+        # Tidak perlu memperbarui kartu selama halaman tersembunyi
+        if self.after_id:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+
     def build_ui(self):
         main = ctk.CTkFrame(self, fg_color="#66bb6a")
         main.pack(fill="both", expand=True)
         container = ctk.CTkFrame(main, width=1150, height=560, fg_color="#f1f8e9", corner_radius=30)
         container.place(relx=0.5, rely=0.5, anchor="center")
-        ctk.CTkLabel(container, text="WASTE CAPACITY MONITOR", font=("Segoe UI", 30, "bold"), text_color="#1b5e20").pack(pady=(25, 10))
+        ctk.CTkLabel(container, text="WASTE CAPACITY MONITOR", font=("Segoe UI", 30, "bold"), text_color="#1b5e20").pack(pady=(25, 0))
+        self.source_label = ctk.CTkLabel(container, text="", font=("Segoe UI", 13), text_color="#616161")
+        self.source_label.pack(pady=(0, 5))
         area = ctk.CTkFrame(container, fg_color="transparent")
-        area.pack(expand=True, pady=20)
+        area.pack(expand=True, pady=15)
         bins = [("🍃 ORGANIK", "organik", "#2e7d32"), ("🧴 ANORGANIK", "anorganik", "#f9a825"), ("☣️ B3", "b3", "#c62828")]
         for title, key, color in bins:
             self.create_card(area, title, key, color)
 
     def create_card(self, parent, title, key, color):
-        card = ctk.CTkFrame(parent, width=320, height=400, fg_color="white", corner_radius=25)
+        card = ctk.CTkFrame(parent, width=320, height=420, fg_color="white", corner_radius=25)
         card.pack(side="left", padx=25)
         ctk.CTkLabel(card, text=title, font=("Segoe UI", 20, "bold"), text_color=color).pack(pady=(20, 5))
         percent = ctk.CTkLabel(card, text="0%", font=("Segoe UI", 36, "bold"), text_color="#263238")
@@ -301,30 +413,52 @@ class CapacityPage(ctk.CTkFrame):
         status.pack(pady=(15, 8))
         distance = ctk.CTkLabel(card, text="-- cm", font=("Segoe UI", 13), text_color="#616161")
         distance.pack()
+        eta = ctk.CTkLabel(card, text="Penuh dalam: --", font=("Segoe UI", 13), text_color="#616161")
+        eta.pack(pady=(0, 10))
         self.cards[key] = {
             "percent": percent,
             "bar": bar,
             "status": status,
-            "distance": distance
+            "distance": distance,
+            "eta": eta
         }
 
+    def update_source(self):
+        if not self.remote:
+            self.source_label.configure(text="Sumber: sensor lokal")
+            return
+        link, age = self.app.link, self.sampler.age()
+        if not link.connected:
+            text = "Sumber: Raspberry Pi (tidak terhubung, menampilkan data terakhir)"
+        elif age is None:
+            text = "Sumber: Raspberry Pi (menunggu data...)"
+        else:
+            text = f"Sumber: Raspberry Pi (update {format_eta(age) if age >= 60 else f'{age:.0f}s'} lalu)"
+        self.source_label.configure(text=text)
+
     def update_data(self):
-        data = self.monitor.read_all()
-        for jenis, jarak in data.items():
+        # Hanya membaca snapshot terakhir (sampler lokal atau push Pi): tidak pernah menunggu
+        snapshot = self.sampler.snapshot()
+        self.update_source()
+        for jenis, reading in snapshot.bins.items():
             card = self.cards.get(jenis)
-            if not card or jarak is None:
+            if not card or reading.distance is None:
                 continue
-            persen = self.monitor.get_percentage(jarak)
+            if self.remote:
+                forecast = self.sampler.eta(jenis)
+                if forecast:
+                    card["eta"].configure(text=f"Penuh dalam: {format_eta(forecast[0])} ({forecast[1]:+.1f}%/jam)")
+            persen = reading.percent
             card["percent"].configure(text=f"{persen}%")
             card["bar"].set(persen / 100)
-            card["distance"].configure(text=f"{jarak} cm")
+            card["distance"].configure(text=f"{reading.distance} cm")
             if persen >= 85:
                 card["status"].configure(text="PENUH", fg_color="#ffebee", text_color="#c62828")
             elif persen >= 65:
                 card["status"].configure(text="HAMPIR PENUH", fg_color="#fff8e1", text_color="#f9a825")
             else:
                 card["status"].configure(text="AMAN", fg_color="#e8f5e9", text_color="#2e7d32")
-        self.after(1200, self.update_data)
+        self.after_id = self.after(500, self.update_data)
 
 class AboutPage(ctk.CTkFrame):
     def __init__(self, parent):
@@ -342,19 +476,49 @@ class CameraPage(ctk.CTkFrame):
         super().__init__(parent)
         self.app = app
         self.pack(fill="both", expand=True)
+        if CV2_AVAILABLE:
+            # Biasanya sudah dimuat preloader; kalau belum, tunggu di sini
+            load_vision()
         self.running = False
-        self.cap = None
+        self.cameras = None
         self.camera_image = None
-        self.connected = False
-        self.sock = None  # <--- Tambahkan ini
+        # Buffer tampilan dipakai ulang antar frame (lihat framebuf.py)
+        self.display = DisplayBuffer((600, 450)) if CV2_AVAILABLE else None
+        self.display_image = None
+        self.display_source = None
+        self.display_size = (600, 450)
+        self.display_frame = None
+        self.display_ready = True
+        self.last_display = 0.0
+        self.visible = True
+        self.link = None
+        self.pipeline = None
+        self.detector = None
+        self.tracks = None
+        self.recorder = None
+        self.rois = load_rois(ROI_FILE) if CV2_AVAILABLE else {}
+        self.roi_editing = False
+        self.roi_drag = None
+
+        # Backend diambil dari registry bersama, tidak dimuat ulang tiap buka tab
+        self.backend = None
 
+        self.build_ui()
         if YOLO_AVAILABLE:
-            self.model = YOLO("yolov8n.pt")
-        else:
-            self.model = None
+            threading.Thread(target=self.load_model, daemon=True).start()
+        self.attach_link()
 
-        self.build_ui()
-        threading.Thread(target=self.try_connect_raspberry, daemon=True).start()
+    def activate(self):
+        self.visible = True
+
+    def deactivate(self):
+        # Deteksi dan pengiriman perintah tetap jalan saat tab lain dibuka;
+        # hanya gambar + konversi tampilan yang dijeda
+        self.visible = False
+
+    def load_model(self):
+        self.backend = MODELS.backend(INFERENCE_BACKEND, DEFAULT_MODEL, INFERENCE_IMGSZ, INFERENCE_THREADS, len(CAMERA_SOURCES),
+                                      dynamic=inference_dynamic())
 
     def build_ui(self):
         main = ctk.CTkFrame(self, fg_color="#66bb6a")
@@ -408,8 +572,7 @@ class CameraPage(ctk.CTkFrame):
             hover_color="#2e7d32",
             font=("Segoe UI", 14, "bold"),
             width=180, height=45,
-            command=self.start_camera,
-            state="disabled"
+            command=self.start_camera
         )
         self.start_btn.place(x=30, y=340)
 
@@ -424,12 +587,33 @@ class CameraPage(ctk.CTkFrame):
         )
         self.stop_btn.place(x=230, y=340)
 
+        self.roi_btn = ctk.CTkButton(
+            left, text="ATUR ROI",
+            fg_color="#fbc02d",
+            hover_color="#fdd835",
+            text_color="black",
+            font=("Segoe UI", 13, "bold"),
+            width=180, height=35,
+            command=self.toggle_roi_edit
+        )
+        self.roi_btn.place(x=30, y=400)
+
+        ctk.CTkButton(
+            left, text="RESET ROI",
+            fg_color="#9e9e9e",
+            hover_color="#757575",
+            font=("Segoe UI", 13, "bold"),
+            width=180, height=35,
+            command=self.reset_roi
+        ).place(x=230, y=400)
+
         # ===== RIGHT PANEL =====
         right = ctk.CTkFrame(
             content, width=620, height=480,
             fg_color="black", corner_radius=20
         )
         right.place(x=460, y=20)
+        self.camera_area = right
 
         self.camera_label = ctk.CTkLabel(
             right,
@@ -438,115 +622,240 @@ class CameraPage(ctk.CTkFrame):
             text_color="white"
         )
         self.camera_label.place(relx=0.5, rely=0.5, anchor="center")
-
-    def try_connect_raspberry(self):
-        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.camera_label.bind("<ButtonPress-1>", self.on_roi_press)
+        self.camera_label.bind("<B1-Motion>", self.on_roi_drag)
+        self.camera_label.bind("<ButtonRelease-1>", self.on_roi_release)
+
+    # ===== KONEKSI RASPBERRY PI =====
+    # Satu RaspberryLink per aplikasi: menyambung ulang sendiri di background
+    # dan menampung perintah selama terputus.
+    def attach_link(self):
+        self.link = self.app.ensure_link()
+        self.link.on_state = self.on_link_state
+        self.link.on_reply = self.on_link_reply
+        self.on_link_state(self.link.connected, "")
+
+    def on_link_state(self, connected, detail):
+        if connected:
+            text, color = "Status: Terhubung ke Raspberry Pi", "#43a047"
+        else:
+            text, color = "Status: Tidak terhubung ke Raspberry Pi (menyambung ulang...)", "#c62828"
+            if detail:
+                print("🔌 Raspberry Pi:", detail)
+        queued = self.link.queued() if self.link else 0
+        if queued:
+            text += f" | {queued} perintah antre"
+        def set_status():
+            if self.status_label.winfo_exists():
+                self.status_label.configure(text=text, text_color=color)
         try:
-            def set_status(text, color):
-                if self.status_label.winfo_exists():
-                    self.status_label.configure(text=text, text_color=color)
-            self.status_label.after(0, set_status, "Status: Menghubungkan ke Raspberry Pi...", "#fbc02d")
-            client.settimeout(5)
-            client.connect((self.RASPBERRY_IP, self.PORT))
-            # Handshake: kirim "HELLO", tunggu balasan "OK"
-            client.sendall(b"HELLO")
-            resp = client.recv(1024)
-            if resp != b"OK":
-                raise Exception("Handshake gagal")
-            self.connected = True
-            self.sock = client  # <--- Simpan socket di self.sock
-
-            # Update UI di thread utama
-            def enable_start():
-                if self.start_btn.winfo_exists():
-                    self.start_btn.configure(state="normal")
-            self.status_label.after(0, set_status, "Status: Terhubung ke Raspberry Pi", "#43a047")
-            self.start_btn.after(0, enable_start)
-            return
+            self.status_label.after(0, set_status)
         except Exception:
-            self.connected = False
-            def disable_start():
-                if self.start_btn.winfo_exists():
-                    self.start_btn.configure(state="disabled")
-            self.status_label.after(0, set_status, "Status: Tidak terhubung ke Raspberry Pi", "#c62828")
-            self.start_btn.after(0, disable_start)
-            client.close()
+            pass  # halaman sudah ditutup
 
-    def process_frame(self, frame):
-        if not self.model:
-            return "non", frame
-        results = self.model(frame, verbose=False)
-        for r in results:
-            for box in r.boxes:
-                if float(box.conf[0]) < 0.5:
-                    continue
-                cls_id = int(box.cls[0])
-                class_name = self.model.names[cls_id]
-                for waste_type, items in WASTE_MAP.items():
-                    if class_name in items:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        import cv2
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), WASTE_COLOR[waste_type], 2)
-                        cv2.putText(frame, f"{waste_type} ({class_name})", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, WASTE_COLOR[waste_type], 2)
-                        return waste_type.lower(), frame  # <--- ubah ke lowercase
-        return "non", frame
+    def on_link_reply(self, msg, latency):
+        latency = f" {latency:.0f} ms" if latency is not None else ""
+        seq = msg.payload.get("ack", msg.seq)
+        if msg.type == ACK:
+            print(f"✅ ACK seq {seq}{latency}:", msg.payload)
+        else:
+            print(f"❌ NACK seq {seq}{latency}:", msg.payload)
+
+    # ===== REGION OF INTEREST =====
+    # ROI digambar dengan drag mouse di gambar kamera saat mode ATUR ROI aktif,
+    # lalu disimpan ke ROI_FILE supaya dipakai lagi saat aplikasi dibuka.
+    def toggle_roi_edit(self):
+        self.roi_editing = not self.roi_editing
+        if self.roi_editing:
+            self.roi_btn.configure(text="SELESAI ROI")
+        else:
+            self.roi_btn.configure(text="ATUR ROI")
+            save_rois(ROI_FILE, self.rois)
+            print("💾 ROI disimpan:", self.rois)
+
+    def reset_roi(self):
+        self.rois = {}
+        if self.detector:
+            self.detector.rois = self.rois
+        save_rois(ROI_FILE, self.rois)
+
+    def roi_point(self, event):
+        # Posisi mouse di label (ukuran tampilan) -> (index kamera, x, y ternormalisasi)
+        cols = math.ceil(math.sqrt(len(CAMERA_SOURCES)))
+        rows = math.ceil(len(CAMERA_SOURCES) / cols)
+        if self.display_source is not None:
+            h, w = self.display_source.shape[:2]
+        else:
+            w, h = self.display_size
+        gx = min(max(event.x / w, 0.0), 0.999) * cols
+        gy = min(max(event.y / h, 0.0), 0.999) * rows
+        index = int(gy) * cols + int(gx)
+        return index, gx - int(gx), gy - int(gy)
+
+    def on_roi_press(self, event):
+        if self.roi_editing:
+            self.roi_drag = self.roi_point(event) * 2
+
+    def on_roi_drag(self, event):
+        if self.roi_editing and self.roi_drag:
+            index, x, y = self.roi_point(event)
+            if index == self.roi_drag[0]:
+                self.roi_drag = self.roi_drag[:3] + (index, x, y)
+
+    def on_roi_release(self, event):
+        if not self.roi_editing or not self.roi_drag:
+            return
+        index, x1, y1, _, x2, y2 = self.roi_drag
+        self.roi_drag = None
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        if box[2] - box[0] < 0.05 or box[3] - box[1] < 0.05:
+            return
+        # Dict baru (bukan diubah di tempat) karena dibaca thread inferensi
+        rois = {k: list(v) for k, v in self.rois.items()}
+        rois.setdefault(index, []).append(box)
+        self.rois = rois
+        if self.detector:
+            self.detector.rois = rois
+
+    def draw_rois(self, frame, index):
+        boxes = list(self.rois.get(index, []))
+        if self.roi_drag and self.roi_drag[0] == index:
+            _, x1, y1, _, x2, y2 = self.roi_drag
+            boxes.append((min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+        for roi in boxes:
+            x1, y1, x2, y2 = roi_to_pixels(roi, frame.shape)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 1)
+        return frame
+
+    def detect(self, frames):
+        # Semua kamera (dan semua ROI) diproses dalam satu panggilan model
+        if not self.backend:
+            return "non", [[] for _ in frames]
+        if self.detector is None:
+            self.detector = WasteDetector(self.backend, WASTE_MAP, CONF_THRESHOLD, CLASS_CONF,
+                                          self.tracks, self.rois, INFERENCE_IMGSZ)
+        return self.detector(frames)
+
+    def draw_boxes(self, frame, detections):
+        for x1, y1, x2, y2, kategori, class_name in detections:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), WASTE_COLOR[kategori], 2)
+            cv2.putText(frame, f"{kategori} ({class_name})", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, WASTE_COLOR[kategori], 2)
+        return frame
+
+    def draw_status(self, frame, waste_type):
+        if self.link and waste_type in ["organik", "anorganik", "b3"]:
+            # Tampilkan info di frame
+            cv2.putText(frame, f"SEND: BUKA:{waste_type}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+        cv2.putText(frame, f"DETEKSI: {waste_type}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, WASTE_COLOR.get(waste_type.upper(), (0,255,0)), 2)
+        return frame
+
+    def annotate(self, frame, waste_type, detections):
+        return self.draw_status(self.draw_boxes(frame, detections), waste_type)
 
-    def camera_loop(self):
-        import cv2
-        from PIL import Image, ImageTk
-        self.cap = cv2.VideoCapture(0)
-        sock = self.sock  # <--- Pakai socket yang sudah terhubung
-        last_sent = None
-        last_time = 0
-
-        while self.running and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-            waste_type, frame = self.process_frame(frame)
-            # Kirim perintah ke Raspberry Pi jika terdeteksi
-            if sock and waste_type in ["organik", "anorganik", "b3"]:
-                now = time.time()
-                if waste_type != last_sent or now - last_time > 3:
-                    cmd = f"BUKA:{waste_type}"
-                    try:
-                        sock.sendall(cmd.encode())
-                        print("📤 Kirim ke Raspberry:", cmd)
-                        last_sent = waste_type
-                        last_time = now
-                    except Exception as e:
-                        print("❌ Socket error:", e)
-                        break
-                # Tampilkan info di frame
-                cv2.putText(
-                    frame,
-                    f"SEND: BUKA:{waste_type}",
-                    (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (255, 255, 0),
-                    2
-                )
-            cv2.putText(frame, f"DETEKSI: {waste_type}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, WASTE_COLOR.get(waste_type.upper(), (0,255,0)), 2)
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame).resize((600, 450))
-            self.camera_image = ImageTk.PhotoImage(img)
+    def process_frame(self, frame):
+        waste_type, detections = self.detect([frame])
+        return waste_type, self.annotate(frame, waste_type, detections[0])
+
+    # ===== PIPELINE STAGES =====
+    def capture_stage(self):
+        if not self.cameras:
+            return None
+        return self.cameras.read()
+
+    def render_stage(self, packet):
+        # Thread render: hanya menggambar kalau Tk sudah menampilkan frame
+        # sebelumnya dan jeda DISPLAY_FPS terpenuhi. Frame lain dilewati,
+        # jadi tidak ada resize/konversi untuk frame yang tak pernah tampil.
+        now = time.perf_counter()
+        if not self.visible or not self.display_ready or now - self.last_display < 1 / DISPLAY_FPS:
+            return
+        frames = [self.draw_rois(self.draw_boxes(f, d), i) for i, (f, d) in enumerate(zip(packet.frame, packet.detections))]
+        frame = self.draw_status(self.display.compose(frames), packet.waste_type)
+        # Resize OpenCV langsung ke ukuran area tampilan yang sebenarnya
+        self.display_frame = self.display.render(frame, self.display_size)
+        self.display_ready = False
+        self.last_display = now
+        try:
+            self.after(0, self.show_frame)
+        except RuntimeError:
+            # Main loop sudah berhenti (aplikasi ditutup)
+            self.display_ready = True
+
+    def show_frame(self):
+        # Tk main thread: satu-satunya tempat widget kamera disentuh
+        rgba = self.display_frame
+        if self.display_image is None or self.display_source is not rgba:
+            # Buffer RGBA baru (ukuran berubah): bungkus PIL + PhotoImage sekali
+            self.display_source = rgba
+            self.display_image = Image.frombuffer("RGBA", (rgba.shape[1], rgba.shape[0]), rgba, "raw", "RGBA", 0, 1)
+            self.camera_image = ImageTk.PhotoImage(self.display_image)
             self.camera_label.configure(image=self.camera_image, text="")
-            time.sleep(0.01)
-        if self.cap:
-            self.cap.release()
-            self.cap = None
-        if self.sock:
-            self.sock.close()
-            self.sock = None
+        else:
+            self.camera_image.paste(self.display_image)
+        self.display_size = self.fit_display()
+        self.display_ready = True
+
+    def fit_display(self):
+        # Ukuran terbesar 4:3 yang muat di panel kamera (mengikuti scaling CTk)
+        w = self.camera_area.winfo_width() - 20
+        h = self.camera_area.winfo_height() - 30
+        if w <= 1 or h <= 1:
+            return self.display_size
+        w = min(w, h * 4 // 3)
+        return (w, w * 3 // 4)
+
+    def send_stage(self, batch):
+        # Kirim perintah ke Raspberry Pi jika terdeteksi
+        now = time.time()
+        commands = []
+        for waste_type in batch:
+            # Tanpa tracker: cegah kirim ulang jenis yang sama dalam 3 detik
+            if not self.tracks and waste_type == self.last_sent and now - self.last_time <= 3:
+                continue
+            commands.append(command(waste_type))
+            self.last_sent = waste_type
+            self.last_time = now
+        if commands:
+            # Tidak pernah blok: kalau Pi terputus, perintah antre di link
+            self.link.submit(commands)
+
+    def on_pipeline_report(self, line):
+        print("📊", line)
+
+    def on_pipeline_stop(self):
+        self.running = False
         self.cleanup()
 
+    def camera_loop(self):
+        self.cameras = MultiCamera(CAMERA_SOURCES, cv2.VideoCapture)
+        self.cameras.start()
+        self.last_sent = None
+        self.last_time = 0
+        self.tracks = TrackManager(CONFIRM_FRAMES, refresh_every=TRACK_REFRESH_EVERY) if TRACKING else None
+        self.detector = None
+        if RECORD_ENABLED:
+            self.recorder = FrameRecorder(RECORD_DIR, RECORD_MODE, RECORD_SAMPLE_EVERY, save_raw=RECORD_RAW,
+                                          save_annotated=RECORD_ANNOTATED, max_mb=RECORD_MAX_MB, colors=WASTE_COLOR)
+        self.pipeline = DetectionPipeline(
+            capture=self.capture_stage,
+            detect=self.detect,
+            render=self.render_stage,
+            send=self.send_stage if self.link else None,
+            on_stop=self.on_pipeline_stop,
+            on_report=self.on_pipeline_report,
+            gate=MotionGate(MOTION_THRESHOLD, MOTION_PIXEL_DELTA, MOTION_COOLDOWN) if MOTION_GATE else None,
+            tracker=self.tracks,
+            recorder=self.recorder,
+        )
+        self.pipeline.start()
+
     def start_camera(self):
-        if not self.connected:
-            self.status_label.configure(text="Status: Tidak terhubung ke Raspberry Pi", text_color="#c62828")
-            return
+        # Deteksi boleh jalan walau Pi belum terhubung; perintah akan antre
         if self.running:
             return
+        if not CV2_AVAILABLE:
+            print("❌ OpenCV / NumPy / Pillow belum terpasang, kamera tidak bisa dijalankan")
+            return
         self.running = True
         self.start_btn.configure(state="disabled")
         self.stop_btn.configure(state="normal")
@@ -555,13 +864,18 @@ class CameraPage(ctk.CTkFrame):
 
     def stop_camera(self):
         self.running = False
+        if self.pipeline:
+            threading.Thread(target=self.pipeline.stop, daemon=True).start()
         self.start_btn.configure(state="normal")
         self.stop_btn.configure(state="disabled")
 
     def cleanup(self):
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        if self.cameras:
+            self.cameras.stop()
+            self.cameras = None
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def connect_to_raspberry(self):
         client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -606,7 +920,45 @@ class App(ctk.CTk):
         self.content_frame = ctk.CTkFrame(self, fg_color="#66bb6a")
         self.content_frame.pack(fill="both", expand=True)
         self.current_page = None
+        self.pages = {}
+        self.link = None
+        self.remote_capacity = RemoteCapacity(CapacityMonitor.ULTRASONIC)
         self.show_home()
+        # Import vision + muat model di background setelah window tampil
+        self.after(100, lambda: threading.Thread(target=self.preload_vision, name="preload-vision", daemon=True).start())
+
+    def preload_vision(self):
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT, METRICS_HOST)
+        if not CV2_AVAILABLE:
+            STARTUP.report()
+            return
+        load_vision()
+        if not YOLO_AVAILABLE:
+            STARTUP.report()
+            return
+        if INFERENCE_BACKEND == "ultralytics":
+            # Import torch dicatat sendiri di rincian import startup; MODELS
+            # lalu memakai modul yang sudah ada di sys.modules. Backend
+            # ONNX/OpenVINO dengan model ter-cache tidak perlu torch sama sekali.
+            with STARTUP.importing("ultralytics/torch"):
+                importlib.import_module("ultralytics")
+        MODELS.preload(DEFAULT_MODEL, callback=self.on_model_ready, kind=INFERENCE_BACKEND, imgsz=INFERENCE_IMGSZ,
+                       threads=INFERENCE_THREADS, batch=len(CAMERA_SOURCES), dynamic=inference_dynamic())
+
+    def on_model_ready(self, model):
+        STARTUP.mark("model ready")
+        STARTUP.report()
+
+    def ensure_link(self):
+        # Satu RaspberryLink per aplikasi: perintah dari CameraPage dan push
+        # kapasitas untuk CapacityPage lewat koneksi yang sama
+        if self.link is None:
+            self.link = RaspberryLink(CameraPage.RASPBERRY_IP, CameraPage.PORT, COMMAND_QUEUE_SIZE, COMMAND_MAX_AGE)
+            self.link.subscription = {"topics": ["capacity"], "threshold": CAPACITY_PUSH_THRESHOLD}
+            self.link.on_capacity = self.remote_capacity.apply
+            self.link.start()
+        return self.link
 
     def build_navbar(self):
         navbar = ctk.CTkFrame(self, height=60, fg_color="#43a047", corner_radius=0)
@@ -625,39 +977,52 @@ class App(ctk.CTk):
     def nav_btn(self, parent, text, cmd):
         ctk.CTkButton(parent, text=text, command=cmd, fg_color="transparent", hover_color="#66bb6a", text_color="white", font=("Segoe UI", 14), width=100).pack(side="left", padx=8)
 
-    def clear_page(self):
+    # ===== PAGE CACHE =====
+    # Setiap halaman dibuat sekali saat pertama dibuka, lalu hanya
+    # disembunyikan/ditampilkan lagi. Halaman boleh punya activate() /
+    # deactivate() untuk menjalankan atau menjeda pekerjaan berkala.
+    def show_page(self, page_class, *args):
+        page = self.pages.get(page_class)
+        if page is not None and page is self.current_page:
+            return
         if self.current_page:
-            self.current_page.destroy()
-            self.current_page = None
+            if hasattr(self.current_page, "deactivate"):
+                self.current_page.deactivate()
+            self.current_page.pack_forget()
+        if page is None:
+            page = self.pages[page_class] = page_class(self.content_frame, *args)
+        else:
+            page.pack(fill="both", expand=True)
+        self.current_page = page
+        if hasattr(page, "activate"):
+            page.activate()
 
     def show_home(self):
-        self.clear_page()
-        self.current_page = HomePage(self.content_frame, self)
+        self.show_page(HomePage, self)
 
     def show_camera(self):
-        self.clear_page()
-        self.current_page = CameraPage(self.content_frame, self)
+        self.show_page(CameraPage, self)
 
     def show_lid(self):
-        self.clear_page()
-        self.current_page = LidPage(self.content_frame, self)
+        self.show_page(LidPage, self)
 
     def show_capacity(self):
-        self.clear_page()
-        self.current_page = CapacityPage(self.content_frame, self)
+        self.show_page(CapacityPage, self)
 
     def show_about(self):
-        self.clear_page()
-        self.current_page = AboutPage(self.content_frame)
+        self.show_page(AboutPage)
 
     def show_readmore(self):
-        self.clear_page()
-        self.current_page = ReadMorePage(self.content_frame, self)
+        self.show_page(ReadMorePage, self)
 
 # ================= RUN APP =================
 if __name__ == "__main__":
     app = App()
+    STARTUP.mark("app constructed")
+    app.after(0, lambda: STARTUP.mark("first window"))
     app.mainloop()
+    # Laporan tetap ditulis walau model belum sempat siap
+    STARTUP.report()
 
     # ================= SOCKET SERVER (Raspberry Pi) =================
     import socket
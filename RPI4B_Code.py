@@ -1,7 +1,25 @@
-import customtkinter as ctk
+from startup import StartupTimer
+STARTUP = StartupTimer("rpi4b")
+
+with STARTUP.importing("customtkinter"):
+    import customtkinter as ctk
+import math
 import time
-import socket
+import asyncio
 import threading
+from concurrent.futures import ThreadPoolExecutor
+with STARTUP.importing("app modules"):
+    from actuation import ActuationEngine
+    from capacity import CapacityDelta, CapacitySampler
+    from history import CapacityStore
+    from forecast import CapacityForecaster, format_eta
+    from metrics import REGISTRY, start_metrics_server
+    from ranging import EchoRanger, RpiGpio, SimulatedGpio
+    from protocol import (
+        FrameDecoder, LegacyDecoder, ProtocolError, encode, is_framed, legacy_reply,
+        HELLO, HELLO_ACK, COMMAND, BATCH, ACK, NACK, PING, PONG, CAPACITY, SUBSCRIBE, TYPE_NAMES, LID_TYPES,
+        VERSION as PROTOCOL_VERSION,
+    )
 
 # ================= GLOBAL THEME =================
 ctk.set_appearance_mode("light")
@@ -9,11 +27,21 @@ ctk.set_default_color_theme("green")
 
 # ================= GPIO (Raspberry Pi) =================
 try:
-    import RPi.GPIO as GPIO
+    with STARTUP.importing("RPi.GPIO"):
+        import RPi.GPIO as GPIO
     GPIO_AVAILABLE = True
 except ImportError:
     GPIO_AVAILABLE = False
 
+AUTO_CLOSE = 5   # detik tutup terbuka setelah perintah BUKA
+HISTORY_DB = "capacity.db"   # riwayat level isi bak (SQLite, lihat history.py)
+# Endpoint Prometheus (lihat metrics.py). Ganti host ke "0.0.0.0" kalau
+# di-scrape dari mesin lain; None = tidak dijalankan.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9102
+# Push kapasitas ke subscriber hanya kalau level bak bergeser >= sekian persen
+CAPACITY_PUSH_THRESHOLD = 1.0
+
 # ================= SERVO CONTROLLER =================
 class LidController:
     SERVO_PINS = {
@@ -65,35 +93,25 @@ class CapacityMonitor:
     TINGGI_BAK = 25   # cm
 
     def __init__(self):
+        # Echo diukur lewat callback tepi GPIO (lihat ranging.py); tanpa
+        # Raspberry Pi dipakai sensor simulasi dengan jalur kode yang sama
         if GPIO_AVAILABLE:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-            for u in self.ULTRASONIC.values():
-                GPIO.setup(u["trig"], GPIO.OUT)
-                GPIO.setup(u["echo"], GPIO.IN)
-                GPIO.output(u["trig"], False)
+            self.gpio = RpiGpio(GPIO)
+        else:
+            self.gpio = SimulatedGpio()
+        self.rangers = {}
+        for jenis, u in self.ULTRASONIC.items():
+            if not GPIO_AVAILABLE:
+                self.gpio.attach(u["trig"], u["echo"], lambda: 5 + (time.time() % 20))
+            self.rangers[jenis] = EchoRanger(self.gpio, u["trig"], u["echo"])
 
-    def get_distance(self, trig, echo):
-        if not GPIO_AVAILABLE:
-            return round(5 + (time.time() % 20), 1)
-        GPIO.output(trig, True)
-        time.sleep(0.00001)
-        GPIO.output(trig, False)
-        start = time.time()
-        while GPIO.input(echo) == 0:
-            if time.time() - start > 0.03:
-                return None
-        t1 = time.time()
-        while GPIO.input(echo) == 1:
-            if time.time() - t1 > 0.03:
-                return None
-        t2 = time.time()
-        return round((t2 - t1) * 17150, 1)
+    def get_distance(self, jenis):
+        return self.rangers[jenis].measure()
 
     def read_all(self):
         data = {}
-        for jenis, u in self.ULTRASONIC.items():
-            data[jenis] = self.get_distance(u["trig"], u["echo"])
+        for jenis in self.ULTRASONIC:
+            data[jenis] = self.get_distance(jenis)
         return data
 
     def get_percentage(self, distance):
@@ -186,8 +204,16 @@ class LidPage(ctk.CTkFrame):
         self.pack(fill="both", expand=True)
         if not hasattr(self.app, "lid_controller"):
             self.app.lid_controller = LidController()
+        if not hasattr(self.app, "actuator"):
+            self.app.actuator = ActuationEngine(self.app.lid_controller)
+        self.status_labels = {}
         self.build_ui()
 
+    def activate(self):
+        # Tutup bisa berubah saat halaman tersembunyi (auto close, perintah laptop)
+        for jenis, label in self.status_labels.items():
+            label.configure(text=f"Status: {self.app.lid_controller.status[jenis].upper()}")
+
     def build_ui(self):
         main = ctk.CTkFrame(self, fg_color="#66bb6a")
         main.pack(fill="both", expand=True)
@@ -207,6 +233,7 @@ class LidPage(ctk.CTkFrame):
         ctk.CTkLabel(card, text=title, font=("Segoe UI", 18, "bold"), text_color=color).pack(pady=15)
         status_label = ctk.CTkLabel(card, text="Status: TUTUP", font=("Segoe UI", 14), text_color="#424242")
         status_label.pack(pady=5)
+        self.status_labels[key] = status_label
         slider = ctk.CTkSlider(card, from_=0, to=100, width=220, command=lambda v: self.on_slider(key, v))
         slider.set(20)
         slider.pack(pady=15)
@@ -216,16 +243,17 @@ class LidPage(ctk.CTkFrame):
         ctk.CTkButton(btn_frame, text="TUTUP", fg_color="#e53935", width=90, command=lambda: self.close_lid(key, status_label, slider)).pack(side="left", padx=8)
 
     def on_slider(self, jenis, value):
-        self.app.lid_controller.set_angle(jenis, value)
+        # Tidak blok UI: servo digerakkan oleh worker bak tersebut
+        self.app.actuator.set_angle(jenis, value)
 
     def open_lid(self, jenis, label, slider):
         slider.set(80)
-        self.app.lid_controller.buka(jenis)
+        self.app.actuator.buka(jenis)
         label.configure(text="Status: BUKA")
 
     def close_lid(self, jenis, label, slider):
         slider.set(20)
-        self.app.lid_controller.tutup(jenis)
+        self.app.actuator.tutup(jenis)
         label.configure(text="Status: TUTUP")
 
 class CapacityPage(ctk.CTkFrame):
@@ -233,11 +261,20 @@ class CapacityPage(ctk.CTkFrame):
         super().__init__(parent)
         self.app = app
         self.pack(fill="both", expand=True)
-        self.monitor = CapacityMonitor()
+        self.sampler = app.capacity
         self.cards = {}
+        self.after_id = None
         self.build_ui()
+
+    def activate(self):
         self.update_data()
 
+    def deactivate(self):
+        # Tidak perlu memperbarui kartu selama halaman tersembunyi
+        if self.after_id:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+
     def build_ui(self):
         main = ctk.CTkFrame(self, fg_color="#66bb6a")
         main.pack(fill="both", expand=True)
@@ -265,30 +302,38 @@ class CapacityPage(ctk.CTkFrame):
         status.pack(pady=(15, 8))
         distance = ctk.CTkLabel(card, text="-- cm", font=("Segoe UI", 13), text_color="#616161")
         distance.pack()
+        eta = ctk.CTkLabel(card, text="Penuh dalam: --", font=("Segoe UI", 13), text_color="#616161")
+        eta.pack(pady=(0, 10))
         self.cards[key] = {
             "percent": percent,
             "bar": bar,
             "status": status,
-            "distance": distance
+            "distance": distance,
+            "eta": eta
         }
 
     def update_data(self):
-        data = self.monitor.read_all()
-        for jenis, jarak in data.items():
+        # Hanya membaca snapshot terakhir dari sampler: tidak pernah menunggu sensor
+        snapshot = self.sampler.snapshot()
+        forecasts = self.app.forecast.snapshot()
+        for jenis, reading in snapshot.bins.items():
             card = self.cards.get(jenis)
-            if not card or jarak is None:
+            if not card or reading.distance is None:
                 continue
-            persen = self.monitor.get_percentage(jarak)
+            f = forecasts.get(jenis)
+            if f and f.rate_per_hour is not None:
+                card["eta"].configure(text=f"Penuh dalam: {format_eta(f.eta)} ({f.rate_per_hour:+.1f}%/jam)")
+            persen = reading.percent
             card["percent"].configure(text=f"{persen}%")
             card["bar"].set(persen / 100)
-            card["distance"].configure(text=f"{jarak} cm")
+            card["distance"].configure(text=f"{reading.distance} cm")
             if persen >= 85:
                 card["status"].configure(text="PENUH", fg_color="#ffebee", text_color="#c62828")
             elif persen >= 65:
                 card["status"].configure(text="HAMPIR PENUH", fg_color="#fff8e1", text_color="#f9a825")
             else:
                 card["status"].configure(text="AMAN", fg_color="#e8f5e9", text_color="#2e7d32")
-        self.after(1200, self.update_data)
+        self.after_id = self.after(500, self.update_data)
 
 class AboutPage(ctk.CTkFrame):
     def __init__(self, parent):
@@ -327,43 +372,276 @@ class CameraPage(ctk.CTkFrame):
         right.place(x=580, y=20)
         ctk.CTkLabel(right, text="Menunggu perintah dari Laptop YOLO...", font=("Segoe UI", 18), text_color="#616161").place(relx=0.5, rely=0.5, anchor="center")
 
-        # Jalankan socket server di background
-        threading.Thread(target=start_socket_server, args=(self.app, self.status_label), daemon=True).start()
-
-def start_socket_server(app, status_label):
-    import threading
+        # Jalankan command server di background (sekali per aplikasi)
+        if getattr(self.app, "command_server", None) is None:
+            self.app.command_server = CommandServer(self.app)
+            self.app.command_server.start()
+        self.app.command_server.attach_status(self.status_label)
+
+def execute_command(app, cmd):
+    jenis = cmd.get("jenis")
+    action = cmd.get("action", "buka")
+    if jenis not in LID_TYPES:
+        raise ValueError(f"jenis tidak dikenal: {jenis}")
+    if action == "buka":
+        # Tutup otomatis setelah AUTO_CLOSE detik; buka berulang memperpanjang
+        done = app.actuator.buka(jenis, hold=AUTO_CLOSE)
+    elif action == "tutup":
+        done = app.actuator.tutup(jenis)
+    else:
+        raise ValueError(f"aksi tidak dikenal: {action}")
+    # Tunggu servo selesai bergerak supaya ACK berarti tutup benar-benar bergerak
+    if not done.wait(2.0):
+        raise TimeoutError(f"servo {jenis} tidak merespons")
+    if done.superseded:
+        raise RuntimeError(f"{action} {jenis} dibatalkan oleh {done.superseded}")
+    return {"jenis": jenis, "status": app.lid_controller.status[jenis]}
+
+def capacity_payload(app):
+    # Level isi terfilter + perkiraan waktu penuh per bak, siap dikirim sebagai JSON
+    snapshot = app.capacity.snapshot()
+    forecasts = app.forecast.snapshot()
+    bins = {}
+    for jenis, reading in snapshot.bins.items():
+        f = forecasts.get(jenis)
+        bins[jenis] = {
+            "percent": reading.percent if reading.distance is not None else None,
+            "distance": reading.distance,
+            "rate_per_hour": f.rate_per_hour if f else None,
+            "eta": round(f.eta) if f and f.eta is not None else None,
+            "full_at": round(f.full_at) if f and f.full_at is not None else None,
+        }
+    return {"timestamp": snapshot.timestamp, "bins": bins}
+
+def handle_message(app, msg):
+    # Mengembalikan (tipe balasan, payload) untuk satu pesan masuk
+    if msg.type == HELLO:
+        return HELLO_ACK, {"server": "rpi4b", "version": PROTOCOL_VERSION}
+    if msg.type == PING:
+        return PONG, {}
+    if msg.type == CAPACITY:
+        return CAPACITY, {"ack": msg.seq, **capacity_payload(app)}
+    if msg.type == COMMAND:
+        try:
+            return ACK, {"ack": msg.seq, **execute_command(app, msg.payload)}
+        except Exception as e:
+            return NACK, {"ack": msg.seq, "error": str(e)}
+    if msg.type == BATCH:
+        results = []
+        for cmd in msg.payload.get("commands", []):
+            try:
+                results.append(execute_command(app, cmd))
+            except Exception as e:
+                results.append({"jenis": cmd.get("jenis"), "error": str(e)})
+        failed = any("error" in r for r in results)
+        return (NACK if failed else ACK), {"ack": msg.seq, "results": results}
+    return NACK, {"ack": msg.seq, "error": f"tipe pesan tidak dikenal: {msg.type}"}
+
+# ================= ASYNC COMMAND SERVER =================
+# Server asyncio di thread sendiri: menerima banyak klien sekaligus
+# (laptop detektor, dashboard, alat tes). Tiap koneksi punya task
+# pembaca + task pemroses dengan antrian terbatas (backpressure), dan
+# ditutup kalau diam lebih dari IDLE_TIMEOUT. Perintah servo dijalankan
+# di thread pool (ActuationEngine menjaga urutan per bak) supaya event
+# loop tidak pernah terblokir. Klien yang mengirim SUBSCRIBE menerima
+# push CAPACITY setiap kali level terfilter berubah (lihat CapacityDelta),
+# tanpa perlu polling.
+class CommandServer:
     HOST = ""  # atau bisa juga "0.0.0.0"
     PORT = 65432
+    IDLE_TIMEOUT = 300   # detik
+    MAX_PENDING = 32     # pesan per koneksi sebelum berhenti membaca socket
+    MAX_PUSH_BUFFER = 64 * 1024   # byte belum terkirim sebelum push ke klien itu ditunda
 
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server.bind((HOST, PORT))
-    server.listen(1)
-    status_label.configure(text="Status: Menunggu Laptop YOLO...", text_color="#fbc02d")
-    print("📡 Menunggu Laptop YOLO...")
-
-    conn, addr = server.accept()
-    status_label.configure(text=f"Status: Terhubung ke {addr[0]}", text_color="#43a047")
-    print(f"✅ Laptop terhubung: {addr}")
-
-    while True:
-        data = conn.recv(1024).decode().strip().lower()
-        if not data:
-            break
-
-        print("📥 Dari Laptop:", data)
-        status_label.configure(text=f"Perintah: {data}", text_color="#fbc02d")
-
-        if data == "hello":
-            conn.sendall(b"OK")
-            continue
-
-        if data.startswith("buka:"):
-            jenis = data.split(":")[1]
-            if jenis in ["organik", "anorganik", "b3"]:
-                app.lid_controller.buka(jenis)
-                # Tutup otomatis setelah 5 detik
-                threading.Timer(5, app.lid_controller.tutup, args=[jenis]).start()
+    def __init__(self, app):
+        self.app = app
+        self.clients = {}
+        self.subscribers = {}   # addr -> [writer, CapacityDelta, seq]
+        self.status_label = None
+        self.loop = None
+        self.executor = ThreadPoolExecutor(max_workers=len(LID_TYPES), thread_name_prefix="lid")
+        self.handle_latency = {t: REGISTRY.histogram("smartwaste_message_seconds", "Durasi memproses satu pesan", type=name)
+                               for t, name in TYPE_NAMES.items()}
+        self.send_latency = REGISTRY.histogram("smartwaste_socket_send_seconds", "Durasi write + drain satu balasan")
+        self.bytes_sent = REGISTRY.counter("smartwaste_socket_sent_bytes", "Byte terkirim lewat socket")
+        REGISTRY.gauge("smartwaste_clients", lambda: len(self.clients), "Klien yang terhubung")
+        REGISTRY.gauge("smartwaste_capacity_subscribers", lambda: len(self.subscribers), "Klien yang berlangganan kapasitas")
+        self.pushes = REGISTRY.counter("smartwaste_capacity_pushes", "Push CAPACITY terkirim")
+        app.capacity.add_listener(self.on_capacity)
+
+    def start(self):
+        threading.Thread(target=lambda: asyncio.run(self.serve()), name="command-server", daemon=True).start()
+
+    def attach_status(self, status_label):
+        self.status_label = status_label
+        self.update_status()
+
+    def set_status(self, text, color):
+        label = self.status_label
+        if not label:
+            return
+        def apply():
+            if label.winfo_exists():
+                label.configure(text=text, text_color=color)
+        label.after(0, apply)
+
+    def update_status(self):
+        if self.clients:
+            names = ", ".join(addr[0] for addr in self.clients)
+            self.set_status(f"Status: Terhubung ke {names} ({len(self.clients)} klien)", "#43a047")
+        else:
+            self.set_status("Status: Menunggu Laptop YOLO...", "#fbc02d")
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle_client, self.HOST or None, self.PORT, reuse_address=True)
+        print(f"📡 Menunggu klien di port {self.PORT}...")
+        async with server:
+            await server.serve_forever()
+
+    async def read(self, reader):
+        return await asyncio.wait_for(reader.read(4096), self.IDLE_TIMEOUT)
+
+    async def handle_client(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        self.clients[addr] = writer
+        print(f"✅ Klien terhubung: {addr}")
+        self.update_status()
+        queue = asyncio.Queue(self.MAX_PENDING)
+        worker = None
+        try:
+            # Byte pertama menentukan protokol: frame biner "SW..." atau teks lama
+            data = await self.read(reader)
+            framed = is_framed(data)
+            decoder = FrameDecoder() if framed else LegacyDecoder()
+            worker = asyncio.create_task(self.process(addr, queue, writer, framed))
+            while data:
+                for msg in decoder.feed(data):
+                    if not await self.enqueue(queue, msg, worker):
+                        break
+                if worker.done():
+                    # Worker berhenti (klien tidak bisa ditulisi): tutup koneksi
+                    break
+                data = await self.read(reader)
+        except asyncio.TimeoutError:
+            print(f"⌛ Klien {addr} diam terlalu lama, koneksi ditutup")
+        except ProtocolError as e:
+            print(f"❌ Protokol error dari {addr}:", e)
+        except ConnectionError:
+            pass
+        finally:
+            if worker:
+                # Jangan pernah menunggu antrian: kalau penuh, sisa pesan dibuang
+                if not worker.done():
+                    try:
+                        queue.put_nowait(None)
+                    except asyncio.QueueFull:
+                        worker.cancel()
+                result = (await asyncio.gather(worker, return_exceptions=True))[0]
+                if isinstance(result, Exception):
+                    print(f"❌ Worker klien {addr} error:", result)
+            self.clients.pop(addr, None)
+            self.subscribers.pop(addr, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            print(f"❌ Klien terputus: {addr}")
+            self.update_status()
+
+    async def enqueue(self, queue, msg, worker):
+        # Antrian penuh -> berhenti membaca -> TCP menahan pengirim. Tapi
+        # kalau worker sudah berhenti, tidak ada yang mengosongkan antrian:
+        # berhenti menunggu dan kembalikan False.
+        if worker.done():
+            return False
+        if not queue.full():
+            queue.put_nowait(msg)
+            return True
+        put = asyncio.ensure_future(queue.put(msg))
+        await asyncio.wait((put, worker), return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    async def handle(self, addr, writer, msg, framed):
+        if not isinstance(msg.payload, dict):
+            raise ValueError(f"payload harus objek JSON, bukan {type(msg.payload).__name__}")
+        self.set_status(f"Perintah: {TYPE_NAMES.get(msg.type, msg.type)} {msg.payload.get('jenis', '')}", "#fbc02d")
+        if msg.type == SUBSCRIBE and framed:
+            return self.subscribe(addr, writer, msg)
+        return await self.loop.run_in_executor(self.executor, handle_message, self.app, msg)
+
+    async def process(self, addr, queue, writer, framed):
+        while True:
+            msg = await queue.get()
+            if msg is None:
+                return
+            print(f"📥 Dari {addr[0]}:", msg)
+            t0 = time.perf_counter()
+            try:
+                reply_type, payload = await self.handle(addr, writer, msg, framed)
+            except Exception as e:
+                # Pesan rusak cukup di-NACK, worker tetap melayani pesan berikutnya
+                print(f"❌ Gagal memproses pesan dari {addr[0]}:", e)
+                reply_type, payload = NACK, {"ack": msg.seq, "error": str(e)}
+            if msg.type in self.handle_latency:
+                self.handle_latency[msg.type].observe(time.perf_counter() - t0)
+            reply = encode(reply_type, msg.seq, payload) if framed else legacy_reply(msg)
+            if not reply or writer.is_closing():
+                continue
+            t0 = time.perf_counter()
+            writer.write(reply)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                return
+            self.send_latency.observe(time.perf_counter() - t0)
+            self.bytes_sent.inc(len(reply))
+            if msg.type == SUBSCRIBE and reply_type == ACK:
+                # Snapshot penuh langsung setelah ACK
+                self.publish()
+
+    # ===== PUSH KAPASITAS =====
+    def subscribe(self, addr, writer, msg):
+        topics = msg.payload.get("topics", ["capacity"])
+        if not isinstance(topics, list) or "capacity" not in topics:
+            return NACK, {"ack": msg.seq, "error": f"topik tidak dikenal: {topics}"}
+        # Ambang dari klien: harus angka >= 0 (bool / teks / NaN ditolak)
+        threshold = msg.payload.get("threshold", CAPACITY_PUSH_THRESHOLD)
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not math.isfinite(threshold) or threshold < 0:
+            return NACK, {"ack": msg.seq, "error": f"threshold tidak valid: {threshold!r}"}
+        threshold = float(threshold)
+        self.subscribers[addr] = [writer, CapacityDelta(threshold), 0]
+        print(f"🔔 {addr[0]} berlangganan kapasitas (ambang {threshold}%)")
+        return ACK, {"ack": msg.seq, "topics": ["capacity"], "threshold": threshold}
+
+    def on_capacity(self, snapshot):
+        # Thread sampler: pindahkan ke event loop, tulis socket hanya di sana
+        if self.subscribers and self.loop:
+            self.loop.call_soon_threadsafe(self.publish)
+
+    def publish(self):
+        if not self.subscribers:
+            return
+        data = capacity_payload(self.app)
+        for addr, sub in list(self.subscribers.items()):
+            writer, delta = sub[0], sub[1]
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > self.MAX_PUSH_BUFFER:
+                # Klien lambat: jangan menumpuk; delta dihitung ulang di push berikutnya
+                continue
+            full, bins = delta.changes(data["bins"])
+            if not bins:
+                continue
+            sub[2] = (sub[2] + 1) & 0xFFFFFFFF
+            push = encode(CAPACITY, sub[2], {"timestamp": data["timestamp"], "full": full, "bins": bins})
+            writer.write(push)
+            self.bytes_sent.inc(len(push))
+            self.pushes.inc()
 
 # ===================== MAIN APP =====================
 class App(ctk.CTk):
@@ -373,10 +651,25 @@ class App(ctk.CTk):
         self.geometry("1200x650")
         self.resizable(False, False)
         self.lid_controller = LidController()
+        self.actuator = ActuationEngine(self.lid_controller)
+        # Satu monitor + sampler untuk seluruh app: callback tepi echo hanya
+        # boleh didaftarkan sekali, dan sensor dibaca di thread sendiri
+        self.capacity_monitor = CapacityMonitor()
+        self.capacity = CapacitySampler(self.capacity_monitor)
+        self.history = CapacityStore(HISTORY_DB)
+        self.forecast = CapacityForecaster(CapacityMonitor.ULTRASONIC)
+        self.forecast.warm_up(self.history)
+        self.capacity.add_listener(self.history.record)
+        self.capacity.add_listener(self.forecast.update)
+        self.history.start()
+        self.capacity.start()
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT, METRICS_HOST)
         self.build_navbar()
         self.content_frame = ctk.CTkFrame(self, fg_color="#66bb6a")
         self.content_frame.pack(fill="both", expand=True)
         self.current_page = None
+        self.pages = {}
         self.show_home()
 
     def build_navbar(self):
@@ -395,36 +688,52 @@ class App(ctk.CTk):
     def nav_btn(self, parent, text, cmd):
         ctk.CTkButton(parent, text=text, command=cmd, fg_color="transparent", hover_color="#66bb6a", text_color="white", font=("Segoe UI", 14), width=100).pack(side="left", padx=8)
 
-    def clear_page(self):
+    # ===== PAGE CACHE =====
+    # Setiap halaman dibuat sekali saat pertama dibuka, lalu hanya
+    # disembunyikan/ditampilkan lagi. Halaman boleh punya activate() /
+    # deactivate() untuk menjalankan atau menjeda pekerjaan berkala.
+    def show_page(self, page_class, *args):
+        page = self.pages.get(page_class)
+        if page is not None and page is self.current_page:
+            return
         if self.current_page:
-            self.current_page.destroy()
-            self.current_page = None
+            if hasattr(self.current_page, "deactivate"):
+                self.current_page.deactivate()
+            self.current_page.pack_forget()
+        if page is None:
+            page = self.pages[page_class] = page_class(self.content_frame, *args)
+        else:
+            page.pack(fill="both", expand=True)
+        self.current_page = page
+        if hasattr(page, "activate"):
+            page.activate()
 
     def show_home(self):
-        self.clear_page()
-        self.current_page = HomePage(self.content_frame, self)
+        self.show_page(HomePage, self)
 
     def show_lid(self):
-        self.clear_page()
-        self.current_page = LidPage(self.content_frame, self)
+        self.show_page(LidPage, self)
 
     def show_capacity(self):
-        self.clear_page()
-        self.current_page = CapacityPage(self.content_frame, self)
+        self.show_page(CapacityPage, self)
 
     def show_about(self):
-        self.clear_page()
-        self.current_page = AboutPage(self.content_frame)
+        self.show_page(AboutPage)
 
     def show_readmore(self):
-        self.clear_page()
-        self.current_page = ReadMorePage(self.content_frame, self)
+        self.show_page(ReadMorePage, self)
 
     def show_camera(self):
-        self.clear_page()
-        self.current_page = CameraPage(self.content_frame, self)
+        self.show_page(CameraPage, self)
 
 # ================= RUN APP =================
 if __name__ == "__main__":
     app = App()
+    STARTUP.mark("app constructed")
+    def first_window():
+        STARTUP.mark("first window")
+        STARTUP.report()
+    app.after(0, first_window)
     app.mainloop()
+    # Tulis sisa sampel yang belum sempat di-flush
+    app.history.close()
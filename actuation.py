@@ -0,0 +1,146 @@
+import threading
+import time
+
+from metrics import REGISTRY
+
+# ================= ACTUATION ENGINE =================
+# Satu worker thread per bak. Pemanggil (socket server, LidPage, auto
+# close) hanya menitipkan keinginan lalu langsung kembali; worker yang
+# menggerakkan servo. Permintaan buka berulang digabung menjadi satu
+# jendela buka yang diperpanjang, dan timer tutup lama otomatis batal
+# karena hanya ada satu deadline per bak.
+class ActionDone(threading.Event):
+    # Di-set saat gerakan selesai. Kalau aksi yang antre ditimpa aksi lain
+    # sebelum sempat dijalankan (mis. BUKA lalu TUTUP), event tetap di-set
+    # tapi superseded berisi aksi penggantinya.
+    def __init__(self):
+        super().__init__()
+        self.superseded = None
+
+class BinWorker(threading.Thread):
+    def __init__(self, controller, jenis):
+        super().__init__(name=f"lid-{jenis}", daemon=True)
+        self.controller = controller
+        self.jenis = jenis
+        self.cond = threading.Condition()
+        self.want = None
+        self.waiters = []
+        self.active = None          # aksi yang sedang dijalankan servo
+        self.active_waiters = []
+        self.last_done = None       # aksi terakhir yang selesai, mis. ("buka", None)
+        self.close_at = 0.0
+        self.running = True
+        self.coalesced = 0
+        self.latency = {action: REGISTRY.histogram("smartwaste_actuation_seconds", "Durasi gerak servo",
+                                                   jenis=jenis, action=action)
+                        for action in ("buka", "tutup", "angle")}
+
+    def submit(self, action, hold=None):
+        done = ActionDone()
+        with self.cond:
+            now = time.monotonic()
+            if action == "buka":
+                # Digabung berdasarkan aksi worker sendiri, bukan status
+                # controller: status tetap "buka" setelah slider atau saat
+                # auto close sedang berjalan, padahal tutup akhirnya tertutup.
+                if self.want is None and self.active is None and self.last_done == ("buka", None):
+                    # Sudah terbuka dan tidak ada gerakan lain: cukup perpanjang jendela buka
+                    self.coalesced += 1
+                    done.set()
+                elif self.want is None and self.active == ("buka", None):
+                    # Servo sedang membuka: selesai bersama gerakan itu
+                    self.coalesced += 1
+                    self.active_waiters.append(done)
+                elif self.want and self.want[0] == "buka":
+                    self.coalesced += 1
+                    self.waiters.append(done)
+                else:
+                    self._supersede("buka")
+                    self.want = ("buka", None)
+                    self.waiters.append(done)
+                if hold is None:
+                    self.close_at = 0.0
+                else:
+                    self.close_at = max(self.close_at, now + hold)
+            else:
+                # tutup / angle manual membatalkan auto close
+                self.close_at = 0.0
+                if self.want != (action, hold):
+                    self._supersede(action)
+                self.want = (action, hold)
+                self.waiters.append(done)
+            self.cond.notify()
+        return done
+
+    def _supersede(self, action):
+        # Penunggu aksi yang antre tidak ikut aksi pengganti: selesaikan
+        # sekarang sebagai "digantikan", jangan sampai BUKA di-ACK oleh TUTUP
+        for done in self.waiters:
+            done.superseded = action
+            done.set()
+        self.waiters = []
+
+    def _next_action(self):
+        with self.cond:
+            while self.running:
+                if self.want is not None:
+                    self.active, self.want = self.want, None
+                    self.active_waiters, self.waiters = self.waiters, []
+                    return self.active
+                now = time.monotonic()
+                if self.close_at and now >= self.close_at:
+                    self.close_at = 0.0
+                    self.active, self.active_waiters = ("tutup", None), []
+                    return self.active
+                self.cond.wait(self.close_at - now if self.close_at else None)
+        return None
+
+    def run(self):
+        while self.running:
+            action = self._next_action()
+            if action is None:
+                break
+            name, value = action
+            t0 = time.perf_counter()
+            try:
+                if name == "buka":
+                    self.controller.buka(self.jenis)
+                elif name == "tutup":
+                    self.controller.tutup(self.jenis)
+                elif name == "angle":
+                    self.controller.set_angle(self.jenis, value)
+            except Exception as e:
+                print(f"❌ Servo {self.jenis} error:", e)
+            self.latency[name].observe(time.perf_counter() - t0)
+            with self.cond:
+                self.last_done, self.active = action, None
+                waiters, self.active_waiters = self.active_waiters, []
+            for done in waiters:
+                done.set()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+class ActuationEngine:
+    def __init__(self, controller):
+        self.controller = controller
+        self.workers = {jenis: BinWorker(controller, jenis) for jenis in controller.SERVO_PINS}
+        for worker in self.workers.values():
+            worker.start()
+
+    def buka(self, jenis, hold=None):
+        # hold = detik sebelum tutup otomatis, None = tetap terbuka
+        return self.workers[jenis].submit("buka", hold)
+
+    def tutup(self, jenis):
+        return self.workers[jenis].submit("tutup")
+
+    def set_angle(self, jenis, angle):
+        # Event slider beruntun tertimpa; hanya sudut terakhir yang dijalankan
+        return self.workers[jenis].submit("angle", angle)
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
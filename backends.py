@@ -0,0 +1,282 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import numpy as np
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+from detection import MODELS, DEFAULT_MODEL
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+BACKENDS = ("ultralytics", "onnx", "openvino")
+
+# ================= EXPORTED MODEL CACHE =================
+# Model diexport sekali per (format, imgsz) lalu disimpan di model_cache/
+# beserta daftar nama kelas, supaya run berikutnya tidak perlu export lagi.
+# dynamic=True dipakai untuk multi kamera agar satu panggilan bisa batch N,
+# dan kalau ada ROI supaya crop kecil bisa dijalankan dengan imgsz lebih kecil.
+def exported_model(name, fmt, imgsz, dynamic=False):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if dynamic:
+        stem += "_dynamic"
+    suffix = ".onnx" if fmt == "onnx" else "_openvino_model"
+    target = os.path.join(CACHE_DIR, f"{stem}_{imgsz}{suffix}")
+    names_path = os.path.join(CACHE_DIR, f"{stem}_{imgsz}_{fmt}.names.json")
+    if os.path.exists(target) and os.path.exists(names_path):
+        with open(names_path, encoding="utf-8") as f:
+            names = {int(k): v for k, v in json.load(f).items()}
+        return target, names
+
+    print(f"📦 Export {name} ke {fmt} (imgsz={imgsz})...")
+    from ultralytics import YOLO
+    model = YOLO(name)
+    exported = model.export(format=fmt, imgsz=imgsz, dynamic=dynamic, verbose=False)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if os.path.exists(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        else:
+            os.remove(target)
+    shutil.move(str(exported), target)
+    with open(names_path, "w", encoding="utf-8") as f:
+        json.dump(model.names, f)
+    return target, dict(model.names)
+
+# ================= YOLOv8 PRE / POST =================
+def letterbox(frame, canvas):
+    # Resize + padding langsung ke canvas (size x size) yang sudah ada
+    size = canvas.shape[0]
+    h, w = frame.shape[:2]
+    ratio = min(size / h, size / w)
+    nw, nh = int(round(w * ratio)), int(round(h * ratio))
+    left, top = (size - nw) // 2, (size - nh) // 2
+    canvas.fill(114)
+    cv2.resize(frame, (nw, nh), dst=canvas[top:top + nh, left:left + nw], interpolation=cv2.INTER_LINEAR)
+    return ratio, (left, top)
+
+def decode_yolov8(output, ratio, pad, shape, min_conf=0.25, iou=0.7):
+    # min_conf = ambang terendah yang dipakai postprocessor (class_conf bisa < 0.25)
+    # output: (1, 4 + nc, N) -> kotak xyxy di koordinat frame asli
+    pred = output[0].T
+    scores = pred[:, 4:]
+    cls = scores.argmax(1)
+    conf = scores[np.arange(len(scores)), cls]
+    keep = conf >= min_conf
+    pred, cls, conf = pred[keep], cls[keep], conf[keep]
+    if not len(conf):
+        return np.zeros((0, 4), np.float32), conf, cls
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / ratio
+    xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / ratio
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+    # NMS per kelas: geser kotak tiap kelas supaya tidak saling menekan
+    offset = cls[:, None].astype(np.float32) * 4096
+    shifted = xyxy + offset
+    boxes = np.concatenate([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]], axis=1)
+    idx = cv2.dnn.NMSBoxes(boxes.tolist(), conf.tolist(), min_conf, iou)
+    idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+    idx = idx[np.argsort(-conf[idx])]
+    return xyxy[idx], conf[idx], cls[idx]
+
+# Tensor input (N, 3, size, size) + canvas letterbox yang dipakai ulang
+# antar panggilan; hanya dialokasikan ulang kalau ukuran batch berubah.
+class InputBuffer:
+    def __init__(self):
+        self.blob = None
+        self.canvas = None
+
+    def fill(self, frames, size):
+        if self.blob is None or self.blob.shape[0] != len(frames) or self.blob.shape[2] != size:
+            self.blob = np.empty((len(frames), 3, size, size), np.float32)
+            self.canvas = np.empty((size, size, 3), np.uint8)
+        metas = []
+        for i, frame in enumerate(frames):
+            ratio, pad = letterbox(frame, self.canvas)
+            # BGR HWC uint8 -> RGB CHW float32, disalin per kanal ke blob
+            for c in range(3):
+                self.blob[i, c] = self.canvas[:, :, 2 - c]
+            metas.append((ratio, pad, frame.shape))
+        # Skala 0..1 in-place (dengan skalar float32 supaya tidak ada buffer cast)
+        np.multiply(self.blob, np.float32(1 / 255.0), out=self.blob)
+        return self.blob, metas
+
+# ================= BACKENDS =================
+# Semua backend punya .names, .predict(frame) -> (xyxy, conf, cls) dan
+# .predict_batch(frames, imgsz=None, min_conf=0.25) -> list hasil per
+# frame dalam satu panggilan model. imgsz lebih kecil dipakai untuk crop
+# (ROI / track); model export statis selalu memakai imgsz export.
+# Hasilnya array numpy, siap untuk WastePostprocessor.from_arrays().
+class ExportedBackend:
+    def __init__(self, imgsz, batch, dynamic=None):
+        self.imgsz = imgsz
+        self.batch = batch
+        # Hanya export dinamis yang bisa menerima ukuran input lain
+        self.dynamic = batch > 1 if dynamic is None else dynamic
+        self.inputs = InputBuffer()
+        self.lock = threading.Lock()
+
+    def run(self, blob):
+        raise NotImplementedError
+
+    def predict(self, frame):
+        return self.predict_batch([frame])[0]
+
+    def predict_batch(self, frames, imgsz=None, min_conf=0.25):
+        size = imgsz if imgsz and self.dynamic else self.imgsz
+        with self.lock:
+            blob, metas = self.inputs.fill(frames, size)
+            if self.dynamic or len(frames) == 1:
+                output = self.run(blob)
+            else:
+                # Model statis batch 1: jalankan per frame
+                output = np.concatenate([self.run(blob[i:i + 1]) for i in range(len(frames))])
+        return [decode_yolov8(output[i:i + 1], ratio, pad, shape, min_conf)
+                for i, (ratio, pad, shape) in enumerate(metas)]
+
+class UltralyticsBackend:
+    kind = "ultralytics"
+
+    def __init__(self, name=DEFAULT_MODEL, imgsz=640, threads=None, batch=1, dynamic=None):
+        # Model PyTorch selalu menerima ukuran input apa pun; dynamic diabaikan
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = MODELS.get(name)
+        if self.model is None:
+            raise RuntimeError(f"model {name} tidak bisa dimuat")
+        self.names = self.model.names
+        self.imgsz = imgsz
+
+    def predict(self, frame):
+        return self.predict_batch([frame])[0]
+
+    def predict_batch(self, frames, imgsz=None, min_conf=0.25):
+        outputs = []
+        for r in self.model(frames, imgsz=imgsz or self.imgsz, conf=min_conf, verbose=False):
+            b = r.boxes.cpu().numpy()
+            outputs.append((b.xyxy, b.conf, b.cls))
+        return outputs
+
+class OnnxBackend(ExportedBackend):
+    kind = "onnx"
+
+    def __init__(self, name=DEFAULT_MODEL, imgsz=640, threads=None, batch=1, dynamic=None):
+        import onnxruntime as ort
+        super().__init__(imgsz, batch, dynamic)
+        path, self.names = exported_model(name, "onnx", imgsz, dynamic=self.dynamic)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+class OpenVinoBackend(ExportedBackend):
+    kind = "openvino"
+
+    def __init__(self, name=DEFAULT_MODEL, imgsz=640, threads=None, batch=1, dynamic=None):
+        try:
+            import openvino as ov
+            core = ov.Core()
+        except (ImportError, AttributeError):
+            from openvino.runtime import Core
+            core = Core()
+        super().__init__(imgsz, batch, dynamic)
+        path, self.names = exported_model(name, "openvino", imgsz, dynamic=self.dynamic)
+        xml = glob.glob(os.path.join(path, "*.xml"))[0]
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(core.read_model(xml), "CPU", config)
+        self.output = self.compiled.output(0)
+
+    def run(self, blob):
+        return self.compiled(blob)[self.output]
+
+BACKEND_CLASSES = {
+    "ultralytics": UltralyticsBackend,
+    "onnx": OnnxBackend,
+    "openvino": OpenVinoBackend,
+}
+
+def create_backend(kind="ultralytics", name=DEFAULT_MODEL, imgsz=640, threads=None, batch=1, warmup=True, dynamic=None):
+    # dynamic=None: export dinamis hanya untuk multi kamera (batch > 1)
+    try:
+        backend = BACKEND_CLASSES[kind](name, imgsz, threads, batch, dynamic)
+    except Exception as e:
+        if kind == "ultralytics":
+            raise
+        print(f"⚠️ Backend {kind} gagal ({e}), kembali ke ultralytics")
+        backend = UltralyticsBackend(name, imgsz, threads, batch)
+    if warmup:
+        backend.predict_batch([np.zeros((480, 640, 3), dtype=np.uint8)] * batch)
+    print(f"🧠 Backend inferensi: {backend.kind} (imgsz={imgsz}, threads={threads or 'auto'}, batch={batch})")
+    return backend
+
+# ================= BACKEND COMPARISON =================
+def load_frames(source, count):
+    frames = []
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*")))[:count]:
+            img = cv2.imread(path)
+            if img is not None:
+                frames.append(img)
+        return frames
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def compare_backends(frames, kinds=BACKENDS, name=DEFAULT_MODEL, imgsz=640, threads=None):
+    rows = []
+    for kind in kinds:
+        try:
+            backend = BACKEND_CLASSES[kind](name, imgsz, threads)
+            backend.predict(frames[0])
+        except Exception as e:
+            print(f"⚠️ Lewati {kind}: {e}")
+            continue
+        latencies = []
+        for frame in frames:
+            t0 = time.perf_counter()
+            backend.predict(frame)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        latencies.sort()
+        mean = sum(latencies) / len(latencies)
+        rows.append((kind, mean, latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]))
+    print(f"\n{'backend':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'fps':>8}")
+    for kind, mean, p50, p95 in rows:
+        print(f"{kind:<12}{mean:>10.1f}{p50:>10.1f}{p95:>10.1f}{1000 / mean:>8.1f}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bandingkan latensi backend inferensi pada frame yang sama")
+    parser.add_argument("--source", default="0", help="index kamera, file video, atau folder gambar")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    args = parser.parse_args()
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        raise SystemExit("❌ Tidak ada frame dari source")
+    print(f"🎞️ {len(frames)} frame dari {args.source}")
+    compare_backends(frames, args.backends.split(","), args.model, args.imgsz, args.threads)
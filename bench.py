@@ -0,0 +1,256 @@
+import argparse
+import collections
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+from daemon import load_config
+from detection import MODELS, WASTE_MAP, MotionGate, WasteDetector, load_rois
+from pipeline import DetectionPipeline
+from startup import git_commit
+from tracking import TrackManager
+
+# ================= REPLAY BENCHMARK =================
+# Cara pakai: python bench.py rekaman.mp4 --out hasil.json
+#             python bench.py folder_gambar/ --pace realtime --fps 15
+#             python bench.py rekaman.mp4 --compare baseline.json
+# Video atau folder gambar diputar ulang lewat DetectionPipeline yang sama
+# dengan CameraPage/daemon (motion gate, tracker, ROI, backend dari
+# --config). Mode "max": capture menunggu inferensi (pipeline lossless),
+# jadi setiap frame diproses dan jumlah deteksi bisa dibandingkan antar
+# commit. Mode "realtime": frame diberikan sesuai fps sumber dan boleh
+# dibuang seperti kamera live; waktu stage capture ikut menghitung jeda
+# pacing. Latensi = capture sampai hasil keluar pipeline. Hasil berupa JSON.
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+class ReplaySource:
+    def __init__(self, path, fps=None):
+        self.path = path
+        self.files = None
+        self.cap = None
+        if os.path.isdir(path):
+            self.files = sorted(p for p in glob.glob(os.path.join(path, "*")) if p.lower().endswith(IMAGE_EXTENSIONS))
+            if not self.files:
+                raise SystemExit(f"❌ Tidak ada gambar di {path}")
+            self.fps = fps or 30.0
+        else:
+            self.cap = cv2.VideoCapture(path)
+            if not self.cap.isOpened():
+                raise SystemExit(f"❌ Tidak bisa membuka {path}")
+            self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.pos = 0
+
+    def read(self):
+        if self.cap is not None:
+            ret, frame = self.cap.read()
+            return frame if ret else None
+        while self.pos < len(self.files):
+            frame = cv2.imread(self.files[self.pos])
+            self.pos += 1
+            if frame is not None:
+                return frame
+        return None
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+def percentile(values, q):
+    # values sudah terurut
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+class ReplayBenchmark:
+    def __init__(self, sources, config, pace="max", max_frames=None, warmup=10):
+        self.sources = sources
+        self.config = config
+        self.pace = pace
+        self.max_frames = max_frames
+        self.warmup = warmup
+        self.fps = min(s.fps for s in sources)
+        self.cond = threading.Condition()
+        self.done = threading.Event()
+        self.submitted = 0
+        self.completed = 0
+        self.latencies = []
+        self.t_first = None
+        self.t_last = None
+        self.t_start = None
+        self.frame_types = collections.Counter()
+        self.classes = collections.Counter()
+        self.categories = collections.Counter()
+        self.sent = collections.Counter()
+        self.pipeline = None
+
+    # ----- stage callbacks -----
+    def capture(self):
+        if self.max_frames is None or self.submitted < self.max_frames:
+            if self.pace == "realtime":
+                delay = self.t_start + self.submitted / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            frames = [s.read() for s in self.sources]
+            if all(f is not None for f in frames):
+                with self.cond:
+                    self.submitted += 1
+                return frames
+        # Sumber habis: tunggu frame yang masih di pipeline sebelum berhenti
+        with self.cond:
+            self.cond.wait_for(lambda: self.completed + self.lost() >= self.submitted, timeout=30)
+        return None
+
+    def lost(self):
+        q = self.pipeline.queues
+        return q["infer"].dropped + q["render"].dropped
+
+    def sink(self, packet):
+        now = time.perf_counter()
+        if not packet.skipped:
+            for det in packet.detections:
+                for _, _, _, _, kategori, class_name in det:
+                    self.classes[class_name] += 1
+                    self.categories[kategori.lower()] += 1
+        with self.cond:
+            self.completed += 1
+            self.frame_types[packet.waste_type] += 1
+            if self.completed > self.warmup:
+                if self.t_first is None:
+                    self.t_first = packet.t_capture
+                self.latencies.append((now - packet.t_capture) * 1000)
+            self.t_last = now
+            self.cond.notify_all()
+
+    def send(self, batch):
+        self.sent.update(batch)
+
+    # ----- jalankan -----
+    def run(self):
+        c = self.config
+        rois = load_rois(c["roi_file"])
+        backend = MODELS.backend(c["backend"], c["model"], c["imgsz"], c["threads"], len(self.sources),
+                                 dynamic=True if rois else None)
+        if backend is None:
+            raise SystemExit("❌ Model gagal dimuat")
+        tracks = TrackManager(c["confirm_frames"], refresh_every=c["track_refresh_every"]) if c["tracking"] else None
+        detector = WasteDetector(backend, WASTE_MAP, c["conf"], c["class_conf"], tracks,
+                                 rois, c["imgsz"])
+        gate = None
+        if c["motion_gate"]:
+            # Cooldown dihitung dalam waktu dinding; di mode max video berjalan
+            # lebih cepat dari aslinya, jadi hasilnya tetap bisa dibandingkan
+            # antar commit tapi bukan angka skip live.
+            gate = MotionGate(c["motion_threshold"], c["motion_pixel_delta"], c["motion_cooldown"])
+        self.pipeline = DetectionPipeline(
+            capture=self.capture,
+            detect=detector,
+            render=self.sink,
+            send=self.send,
+            on_stop=self.done.set,
+            gate=gate,
+            tracker=tracks,
+            lossless=self.pace == "max",
+            # Replay realtime mengikuti fps sumber dan membuang frame seperti dulu
+            on_demand=False,
+        )
+        self.t_start = time.perf_counter()
+        self.pipeline.start()
+        self.done.wait()
+        for s in self.sources:
+            s.release()
+        return self.result()
+
+    def result(self):
+        c = self.config
+        stats = self.pipeline.stats(reset=False)
+        latencies = sorted(self.latencies)
+        span = (self.t_last - self.t_first) if self.t_first is not None else 0.0
+        result = {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "sources": [s.path for s in self.sources],
+            "pace": self.pace,
+            "config": {k: c[k] for k in ("backend", "model", "imgsz", "threads", "conf", "motion_gate",
+                                         "tracking", "confirm_frames", "track_refresh_every", "roi_file")},
+            "frames": {"submitted": self.submitted, "completed": self.completed,
+                       "measured": len(latencies), "warmup": min(self.warmup, self.completed)},
+            "fps": round(len(latencies) / span, 2) if span > 0 else None,
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "p50": round(percentile(latencies, 0.50), 2) if latencies else None,
+                "p95": round(percentile(latencies, 0.95), 2) if latencies else None,
+                "p99": round(percentile(latencies, 0.99), 2) if latencies else None,
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+            "stages": {stage.stats.name: {k: round(v, 3) for k, v in stats[stage.stats.name].items()}
+                       for stage in self.pipeline.stages},
+            "dropped": stats["dropped"],
+            "detections": {
+                "frames_by_type": dict(self.frame_types),
+                "boxes_by_category": dict(self.categories),
+                "boxes_by_class": dict(self.classes),
+                "sent": dict(self.sent),
+            },
+        }
+        if "gate" in stats:
+            result["gate"] = stats["gate"]
+        return result
+
+def print_summary(result, baseline=None, out=sys.stderr):
+    lat = result["latency_ms"]
+    print(f"🎞️ {result['frames']['measured']} frame ({result['pace']}) | {result['fps']} fps | "
+          f"p50 {lat['p50']} ms p95 {lat['p95']} ms p99 {lat['p99']} ms", file=out)
+    for name, s in result["stages"].items():
+        print(f"   {name:<8s} {s['avg_ms']:8.2f} ms  busy {s['busy'] * 100:5.1f}%", file=out)
+    print("   deteksi:", result["detections"]["boxes_by_category"], file=out)
+    if baseline:
+        # Selisih terhadap hasil commit lain (positif = lebih lambat untuk latensi)
+        print(f"📈 dibanding {baseline.get('commit')}:", file=out)
+        rows = [("fps", result["fps"], baseline.get("fps"))]
+        rows += [(k, lat[k], baseline.get("latency_ms", {}).get(k)) for k in ("p50", "p95", "p99")]
+        for name, new, old in rows:
+            if new is None or not old:
+                continue
+            print(f"   {name:<4s} {old:8.2f} -> {new:8.2f} ({(new - old) / old * 100:+.1f}%)", file=out)
+        if result["detections"]["boxes_by_class"] != baseline.get("detections", {}).get("boxes_by_class"):
+            print("⚠️ Jumlah deteksi per kelas berbeda dari baseline", file=out)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline deteksi dengan rekaman video / folder gambar")
+    parser.add_argument("sources", nargs="+", help="file video atau folder gambar (lebih dari satu = multi kamera)")
+    parser.add_argument("--config", help="file JSON daemon.py untuk backend/model/gate/tracker")
+    parser.add_argument("--pace", choices=("max", "realtime"), default="max")
+    parser.add_argument("--fps", type=float, default=None, help="fps untuk folder gambar / paksa fps video")
+    parser.add_argument("--frames", type=int, default=None, help="batasi jumlah frame")
+    parser.add_argument("--warmup", type=int, default=10, help="frame awal yang tidak dihitung latensinya")
+    parser.add_argument("--backend", choices=("ultralytics", "onnx", "openvino"))
+    parser.add_argument("--model")
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--no-motion-gate", dest="motion_gate", action="store_const", const=False)
+    parser.add_argument("--no-tracking", dest="tracking", action="store_const", const=False)
+    parser.add_argument("--out", help="tulis JSON ke file (default stdout)")
+    parser.add_argument("--compare", help="JSON hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    overrides = {k: getattr(args, k) for k in ("backend", "model", "imgsz", "motion_gate", "tracking")
+                 if getattr(args, k) is not None}
+    config = load_config(args.config, overrides)
+    bench = ReplayBenchmark([ReplaySource(p, args.fps) for p in args.sources], config,
+                            args.pace, args.frames, args.warmup)
+    result = bench.run()
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(result, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,154 @@
+import collections
+import statistics
+import threading
+import time
+import types
+
+# ================= CAPACITY SNAPSHOT =================
+# Snapshot tidak pernah diubah setelah dibuat; sampler cukup mengganti
+# referensinya, jadi UI dan server bisa membacanya tanpa lock.
+BinReading = collections.namedtuple("BinReading", "distance percent raw samples misses")
+CapacitySnapshot = collections.namedtuple("CapacitySnapshot", "timestamp seq bins")
+
+def empty_snapshot(bins):
+    return CapacitySnapshot(time.time(), 0, types.MappingProxyType(
+        {jenis: BinReading(None, 0, None, 0, 0) for jenis in bins}))
+
+# ================= CAPACITY SAMPLER =================
+# Thread latar yang terus membaca sensor ultrasonik bergiliran. Tiap bak
+# punya ring buffer berukuran tetap; nilai tampilan = median buffer
+# (membuang pantulan nyasar) lalu dihaluskan dengan EMA. Kalau sensor
+# gagal terus lebih dari satu jendela, buffer dikosongkan dan jarak
+# dilaporkan None daripada menampilkan angka basi.
+class CapacitySampler(threading.Thread):
+    def __init__(self, monitor, interval=0.3, window=7, alpha=0.3):
+        super().__init__(name="capacity-sampler", daemon=True)
+        self.monitor = monitor
+        self.interval = interval
+        self.alpha = alpha
+        self.bins = list(monitor.ULTRASONIC)
+        self.buffers = {jenis: collections.deque(maxlen=window) for jenis in self.bins}
+        self.smooth = dict.fromkeys(self.bins)
+        self.misses = dict.fromkeys(self.bins, 0)
+        self.stop_event = threading.Event()
+        self.latest = empty_snapshot(self.bins)
+        self.listeners = []
+
+    def snapshot(self):
+        return self.latest
+
+    def add_listener(self, callback):
+        # callback(snapshot) dipanggil dari thread sampler, jadi harus cepat
+        self.listeners.append(callback)
+
+    def _sample(self, jenis):
+        buf = self.buffers[jenis]
+        raw = self.monitor.get_distance(jenis)
+        if raw is None:
+            self.misses[jenis] += 1
+            if self.misses[jenis] > buf.maxlen:
+                buf.clear()
+                self.smooth[jenis] = None
+        else:
+            self.misses[jenis] = 0
+            buf.append(raw)
+            median = statistics.median(buf)
+            prev = self.smooth[jenis]
+            self.smooth[jenis] = median if prev is None else prev + self.alpha * (median - prev)
+        distance = self.smooth[jenis]
+        if distance is None:
+            return BinReading(None, 0, raw, len(buf), self.misses[jenis])
+        distance = round(distance, 1)
+        return BinReading(distance, self.monitor.get_percentage(distance), raw, len(buf), self.misses[jenis])
+
+    def run(self):
+        # Jeda antar sensor supaya pantulan satu sensor tidak terbaca sensor lain
+        gap = self.interval / max(len(self.bins), 1)
+        while not self.stop_event.is_set():
+            bins = {}
+            for jenis in self.bins:
+                try:
+                    bins[jenis] = self._sample(jenis)
+                except Exception as e:
+                    print(f"❌ Sensor {jenis} error:", e)
+                    bins[jenis] = self.latest.bins[jenis]
+                if self.stop_event.wait(gap):
+                    return
+            self.latest = CapacitySnapshot(time.time(), self.latest.seq + 1, types.MappingProxyType(bins))
+            for callback in self.listeners:
+                try:
+                    callback(self.latest)
+                except Exception as e:
+                    print("❌ Listener kapasitas error:", e)
+
+    def stop(self):
+        self.stop_event.set()
+
+# ================= CAPACITY PUSH (PI) =================
+# Satu CapacityDelta per subscriber: push pertama berisi semua bak, lalu
+# hanya bak yang level terfilternya bergeser >= threshold persen (atau
+# sensornya mati/hidup lagi) sejak terakhir dikirim ke subscriber itu.
+class CapacityDelta:
+    def __init__(self, threshold=1.0):
+        self.threshold = threshold
+        self.sent = {}   # jenis -> persen terakhir yang dikirim
+
+    def changes(self, bins):
+        # bins: jenis -> dict payload (percent None = sensor tidak terbaca)
+        full = not self.sent
+        changed = {}
+        for jenis, data in bins.items():
+            percent = data["percent"]
+            if jenis in self.sent:
+                last = self.sent[jenis]
+                if (percent is None) == (last is None) and (percent is None or abs(percent - last) < self.threshold):
+                    continue
+            changed[jenis] = data
+            self.sent[jenis] = percent
+        return full, changed
+
+# ================= REMOTE CAPACITY (LAPTOP) =================
+# Menyusun ulang snapshot dari push CAPACITY Raspberry Pi. Bak yang tidak
+# ada di push delta tetap memakai nilai terakhir; push full menimpa semua.
+# Hasilnya CapacitySnapshot yang sama dengan CapacitySampler, jadi
+# CapacityPage bisa membaca keduanya dengan cara yang sama.
+class RemoteCapacity:
+    def __init__(self, bins):
+        self.bins = list(bins)
+        self.latest = empty_snapshot(self.bins)
+        self.details = types.MappingProxyType({})
+        self.received_at = None
+
+    def apply(self, payload):
+        # Dipanggil dari thread pembaca RaspberryLink
+        now = time.monotonic()
+        if payload.get("full"):
+            bins = dict(empty_snapshot(self.bins).bins)
+            details = {}
+        else:
+            bins = dict(self.latest.bins)
+            details = dict(self.details)
+        for jenis, data in payload.get("bins", {}).items():
+            percent = data.get("percent")
+            bins[jenis] = BinReading(data.get("distance"), 0 if percent is None else percent, None, 0, 0)
+            details[jenis] = dict(data, received=now)
+        self.latest = CapacitySnapshot(payload.get("timestamp", time.time()), self.latest.seq + 1,
+                                       types.MappingProxyType(bins))
+        self.details = types.MappingProxyType(details)
+        self.received_at = now
+
+    def snapshot(self):
+        return self.latest
+
+    def eta(self, jenis):
+        # (detik sampai penuh, %/jam) dikoreksi umur push, None kalau belum ada tren
+        data = self.details.get(jenis)
+        if not data or data.get("rate_per_hour") is None:
+            return None
+        eta = data.get("eta")
+        if eta is not None:
+            eta = max(0.0, eta - (time.monotonic() - data["received"]))
+        return eta, data["rate_per_hour"]
+
+    def age(self):
+        return None if self.received_at is None else time.monotonic() - self.received_at
@@ -0,0 +1,237 @@
+import argparse
+import collections
+import json
+import signal
+import sys
+import threading
+import time
+
+import cv2
+
+from detection import MODELS, DEFAULT_MODEL, WASTE_MAP, MotionGate, WasteDetector, load_rois
+from metrics import start_metrics_server
+from pipeline import DetectionPipeline, MultiCamera
+from protocol import RaspberryLink, command, ACK
+from recorder import FrameRecorder
+from tracking import TrackManager
+
+# ================= HEADLESS DETECTION DAEMON =================
+# capture -> deteksi -> kirim ke Raspberry Pi tanpa GUI sama sekali (tidak
+# ada customtkinter, PIL, atau stage render), untuk mini-PC tanpa layar.
+# Konfigurasi dari file JSON (--config) lalu ditimpa flag CLI. Ringkasan
+# throughput dicetak setiap report_every detik.
+#
+# Cara pakai: python daemon.py --config daemon.json
+#             python daemon.py --source 0 1 --raspberry-ip 192.168.137.33
+# Kalau stream kamera berhenti, proses keluar dengan kode 1 supaya bisa
+# di-restart oleh service manager (mis. systemd Restart=on-failure).
+DEFAULT_CONFIG = {
+    "sources": [0],
+    "raspberry_ip": "192.168.137.33",
+    "port": 65432,
+    "backend": "ultralytics",
+    "model": DEFAULT_MODEL,
+    "imgsz": 640,
+    "threads": None,
+    "conf": 0.5,
+    "class_conf": {},
+    "motion_gate": True,
+    "motion_threshold": 0.01,
+    "motion_pixel_delta": 25,
+    "motion_cooldown": 1.5,
+    "tracking": True,
+    "confirm_frames": 3,
+    "track_refresh_every": 5,
+    "roi_file": "roi.json",
+    "command_queue_size": 16,
+    "command_max_age": 10,
+    "report_every": 60.0,
+    "metrics_host": "127.0.0.1",
+    "metrics_port": 9103,   # endpoint Prometheus /metrics, null = mati (GUI laptop 9101, Pi 9102)
+    "dry_run": False,   # deteksi jalan, perintah tidak dikirim ke Pi
+    # Rekam frame untuk dataset (recorder.py); mode detections/sample/both
+    "record": False,
+    "record_dir": "recordings",
+    "record_mode": "detections",
+    "record_sample_every": 2.0,
+    "record_raw": True,
+    "record_annotated": False,
+    "record_max_mb": 2048,
+}
+
+def log(*parts):
+    print(time.strftime("%Y-%m-%d %H:%M:%S"), *parts, flush=True)
+
+def parse_source(source):
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+def load_config(path=None, overrides=None):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        unknown = sorted(set(data) - set(DEFAULT_CONFIG))
+        if unknown:
+            raise SystemExit(f"❌ Key config tidak dikenal di {path}: {', '.join(unknown)}")
+        config.update(data)
+    config.update(overrides or {})
+    config["sources"] = [parse_source(s) for s in config["sources"]]
+    return config
+
+class DetectionDaemon:
+    def __init__(self, config):
+        self.config = config
+        self.stop_event = threading.Event()
+        self.failed = False
+        self.link = None
+        self.cameras = None
+        self.pipeline = None
+        self.tracks = None
+        self.recorder = None
+        self.sent = collections.Counter()
+        self.replies = collections.Counter()
+        self.last_sent = None
+        self.last_time = 0
+        self.started = None
+
+    def start(self):
+        c = self.config
+        if c["metrics_port"]:
+            start_metrics_server(c["metrics_port"], c["metrics_host"])
+        log(f"🧠 Memuat model {c['model']} ({c['backend']}, imgsz {c['imgsz']})...")
+        rois = load_rois(c["roi_file"])
+        # Dengan ROI, crop dijalankan pada imgsz lebih kecil: butuh export dinamis
+        backend = MODELS.backend(c["backend"], c["model"], c["imgsz"], c["threads"], len(c["sources"]),
+                                 dynamic=True if rois else None)
+        if backend is None:
+            raise SystemExit("❌ Model gagal dimuat")
+        self.tracks = TrackManager(c["confirm_frames"], refresh_every=c["track_refresh_every"]) if c["tracking"] else None
+        detector = WasteDetector(backend, WASTE_MAP, c["conf"], c["class_conf"], self.tracks,
+                                 rois, c["imgsz"])
+        if not c["dry_run"]:
+            self.link = RaspberryLink(c["raspberry_ip"], c["port"], c["command_queue_size"], c["command_max_age"])
+            self.link.on_state = self.on_link_state
+            self.link.on_reply = self.on_link_reply
+            self.link.start()
+        self.cameras = MultiCamera(c["sources"], cv2.VideoCapture)
+        self.cameras.start()
+        gate = None
+        if c["motion_gate"]:
+            gate = MotionGate(c["motion_threshold"], c["motion_pixel_delta"], c["motion_cooldown"])
+        if c["record"]:
+            self.recorder = FrameRecorder(c["record_dir"], c["record_mode"], c["record_sample_every"],
+                                          save_raw=c["record_raw"], save_annotated=c["record_annotated"],
+                                          max_mb=c["record_max_mb"])
+        self.pipeline = DetectionPipeline(
+            capture=self.cameras.read,
+            detect=detector,
+            render=None,
+            send=self.send,
+            on_stop=self.on_pipeline_stop,
+            on_report=self.on_report,
+            report_every=c["report_every"],
+            gate=gate,
+            tracker=self.tracks,
+            recorder=self.recorder,
+        )
+        self.started = time.monotonic()
+        self.pipeline.start()
+        log(f"▶️ Deteksi jalan: kamera {c['sources']}, "
+            + ("dry-run" if c["dry_run"] else f"Pi {c['raspberry_ip']}:{c['port']}"))
+
+    def send(self, batch):
+        now = time.time()
+        commands = []
+        for waste_type in batch:
+            # Tanpa tracker: cegah kirim ulang jenis yang sama dalam 3 detik
+            if not self.tracks and waste_type == self.last_sent and now - self.last_time <= 3:
+                continue
+            commands.append(command(waste_type))
+            self.sent[waste_type] += 1
+            self.last_sent = waste_type
+            self.last_time = now
+        if commands and self.link:
+            self.link.submit(commands)
+
+    def on_link_state(self, connected, detail):
+        if connected:
+            log("✅ Terhubung ke Raspberry Pi")
+        else:
+            log("🔌 Raspberry Pi:", detail or "terputus")
+
+    def on_link_reply(self, msg, latency):
+        self.replies["ack" if msg.type == ACK else "nack"] += 1
+        if msg.type != ACK:
+            log(f"❌ NACK seq {msg.payload.get('ack', msg.seq)}:", msg.payload)
+
+    def summary(self, line):
+        sent = ", ".join(f"{k}={v}" for k, v in sorted(self.sent.items())) or "-"
+        line += f" | frame {self.pipeline.seq} | kirim {sent}"
+        if self.link:
+            line += (f" | ack {self.replies['ack']} nack {self.replies['nack']}"
+                     f" | antre {self.link.queued()} buang {self.link.dropped}"
+                     f" | pi {'on' if self.link.connected else 'off'}")
+        return line
+
+    def on_report(self, line):
+        log("📊", self.summary(line))
+
+    def on_pipeline_stop(self):
+        if not self.stop_event.is_set():
+            log("❌ Stream kamera berhenti")
+            self.failed = True
+            self.stop_event.set()
+
+    def run(self):
+        self.start()
+        self.stop_event.wait()
+        self.stop()
+        return 1 if self.failed else 0
+
+    def stop(self):
+        self.stop_event.set()
+        if self.pipeline:
+            self.pipeline.stop()
+            uptime = time.monotonic() - self.started
+            log(f"⏹️ Berhenti setelah {uptime:.0f}s:", self.summary(self.pipeline.report()))
+        if self.cameras:
+            self.cameras.stop()
+        if self.recorder:
+            self.recorder.close()
+        if self.link:
+            self.link.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deteksi sampah headless: kamera -> YOLO -> Raspberry Pi")
+    parser.add_argument("--config", help="file JSON, key sama dengan DEFAULT_CONFIG")
+    parser.add_argument("--source", dest="sources", nargs="+", help="index kamera atau URL stream")
+    parser.add_argument("--raspberry-ip")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--backend", choices=("ultralytics", "onnx", "openvino"))
+    parser.add_argument("--model")
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--conf", type=float)
+    parser.add_argument("--roi-file")
+    parser.add_argument("--report-every", type=float)
+    parser.add_argument("--metrics-port", type=int)
+    parser.add_argument("--no-motion-gate", dest="motion_gate", action="store_const", const=False)
+    parser.add_argument("--no-tracking", dest="tracking", action="store_const", const=False)
+    parser.add_argument("--dry-run", action="store_const", const=True)
+    parser.add_argument("--record", action="store_const", const=True, help="rekam frame untuk dataset")
+    parser.add_argument("--record-mode", choices=("detections", "sample", "both"))
+    parser.add_argument("--print-config", action="store_true", help="tampilkan konfigurasi akhir lalu keluar")
+    args = parser.parse_args()
+
+    overrides = {k: v for k, v in vars(args).items() if v is not None and k not in ("config", "print_config")}
+    config = load_config(args.config, overrides)
+    if args.print_config:
+        print(json.dumps(config, indent=2))
+        raise SystemExit(0)
+
+    daemon = DetectionDaemon(config)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: daemon.stop_event.set())
+    sys.exit(daemon.run())
@@ -0,0 +1,380 @@
+import json
+import math
+import os
+import threading
+import time
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+from metrics import REGISTRY
+
+DEFAULT_MODEL = "yolov8n.pt"
+
+# ================= WASTE MAPPING =================
+# Kelas COCO -> kategori bak. Dipakai CameraPage maupun daemon headless.
+B3_ITEMS = [
+    "cell phone", "laptop", "remote", "tv", "mouse", "refrigerator"
+]
+WASTE_MAP = {
+    "ORGANIK": [
+        "banana", "apple", "orange", "broccoli", "carrot",
+        "sandwich", "hot dog", "pizza", "donut", "cake"
+    ],
+    "B3": B3_ITEMS,
+    "ANORGANIK": [
+        "bottle", "cup", "fork", "spoon", "knife", "scissors",
+        "toothbrush", "keyboard", "microwave", "oven",
+        "toaster", "clock", "vase"
+    ]
+}
+
+# ================= MODEL REGISTRY =================
+# Satu model per proses: dimuat sekali, di-warm-up, lalu dipakai
+# bersama oleh CameraPage maupun pipeline headless.
+class ModelRegistry:
+    WARMUP_SHAPE = (480, 640, 3)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def _load(self, name):
+        from ultralytics import YOLO
+        return YOLO(name)
+
+    def _warmup(self, model):
+        if not NUMPY_AVAILABLE:
+            return
+        dummy = np.zeros(self.WARMUP_SHAPE, dtype=np.uint8)
+        model(dummy, verbose=False)
+
+    def _entry(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                return entry, False
+            entry = {
+                "ready": threading.Event(),
+                "model": None,
+                "error": None,
+                "load_s": None,
+                "warmup_s": None,
+            }
+            self.entries[name] = entry
+            return entry, True
+
+    def _obtain(self, key, build, timeout=None):
+        entry, owner = self._entry(key)
+        if owner:
+            try:
+                t0 = time.perf_counter()
+                entry["model"] = build(entry)
+                entry["load_s"] = time.perf_counter() - t0
+            except Exception as e:
+                entry["error"] = e
+                print(f"❌ Gagal memuat model {key}:", e)
+                # Hapus entry supaya permintaan berikutnya bisa mencoba lagi
+                with self.lock:
+                    self.entries.pop(key, None)
+            finally:
+                entry["ready"].set()
+        elif not entry["ready"].wait(timeout):
+            return None
+        return entry["model"]
+
+    def get(self, name=DEFAULT_MODEL, timeout=None):
+        def build(entry):
+            t0 = time.perf_counter()
+            model = self._load(name)
+            t1 = time.perf_counter()
+            self._warmup(model)
+            entry["warmup_s"] = time.perf_counter() - t1
+            print(f"🧠 Model {name} siap (load {t1 - t0:.2f}s, warm-up {entry['warmup_s']:.2f}s)")
+            return model
+        return self._obtain(name, build, timeout)
+
+    def backend(self, kind="ultralytics", name=DEFAULT_MODEL, imgsz=640, threads=None, batch=1, timeout=None, dynamic=None):
+        from backends import create_backend
+        key = ("backend", kind, name, imgsz, threads, batch, dynamic)
+        return self._obtain(key, lambda entry: create_backend(kind, name, imgsz, threads, batch, dynamic=dynamic), timeout)
+
+    def peek(self, name=DEFAULT_MODEL):
+        entry = self.entries.get(name)
+        if entry is None or not entry["ready"].is_set():
+            return None
+        return entry["model"]
+
+    def is_ready(self, name=DEFAULT_MODEL):
+        return self.peek(name) is not None
+
+    def preload(self, name=DEFAULT_MODEL, callback=None, kind=None, imgsz=640, threads=None, batch=1, dynamic=None):
+        def run():
+            if kind is None:
+                model = self.get(name)
+            else:
+                model = self.backend(kind, name, imgsz, threads, batch, dynamic=dynamic)
+            if callback:
+                callback(model)
+        thread = threading.Thread(target=run, name=f"preload-{name}", daemon=True)
+        thread.start()
+        return thread
+
+MODELS = ModelRegistry()
+
+# ================= POST-PROCESSING =================
+class Detections:
+    def __init__(self, xyxy, conf, cls, category, categories, names):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.category = category
+        self.categories = categories
+        self.names = names
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for (x1, y1, x2, y2), c, k in zip(self.xyxy.tolist(), self.cls.tolist(), self.category.tolist()):
+            yield x1, y1, x2, y2, self.categories[k], self.names[c]
+
+    @property
+    def waste_type(self):
+        if not len(self.conf):
+            return "non"
+        return self.categories[self.category[int(self.conf.argmax())]].lower()
+
+    def counts(self):
+        hitung = np.bincount(self.category, minlength=len(self.categories))
+        return {k.lower(): int(n) for k, n in zip(self.categories, hitung)}
+
+# WASTE_MAP diubah sekali menjadi lookup table class-id -> kategori,
+# lalu semua box difilter dan dipetakan sekaligus dengan operasi array.
+class WastePostprocessor:
+    def __init__(self, names, waste_map, conf=0.5, class_conf=None):
+        self.names = names
+        self.categories = list(waste_map)
+        size = max(names) + 1 if names else 0
+        self.category_lut = np.full(size, -1, dtype=np.int64)
+        self.threshold_lut = np.full(size, float(conf), dtype=np.float32)
+        index = {name: i for i, name in names.items()}
+        for k, kategori in enumerate(self.categories):
+            for class_name in waste_map[kategori]:
+                if class_name in index:
+                    self.category_lut[index[class_name]] = k
+        for class_name, threshold in (class_conf or {}).items():
+            if class_name in index:
+                self.threshold_lut[index[class_name]] = threshold
+        # Ambang terendah kelas yang dipetakan, dioper ke decoder backend
+        # supaya class_conf di bawah batas default decoder tidak terpotong
+        mapped = self.threshold_lut[self.category_lut >= 0]
+        self.min_conf = float(mapped.min()) if len(mapped) else float(conf)
+
+    def empty(self):
+        return Detections(np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32),
+                          np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                          self.categories, self.names)
+
+    def from_arrays(self, xyxy, conf, cls):
+        cls = cls.astype(np.int64, copy=False)
+        category = self.category_lut[cls]
+        keep = (category >= 0) & (conf >= self.threshold_lut[cls])
+        return Detections(xyxy[keep].astype(np.int32), conf[keep], cls[keep], category[keep],
+                          self.categories, self.names)
+
+    def fuse(self, detections_list):
+        # Gabungkan hasil beberapa kamera: tiap kamera menyumbang confidence
+        # tertinggi per kategori, kategori dengan total skor terbesar menang.
+        scores = np.zeros(len(self.categories), dtype=np.float32)
+        for det in detections_list:
+            if len(det):
+                best = np.zeros(len(self.categories), dtype=np.float32)
+                np.maximum.at(best, det.category, det.conf)
+                scores += best
+        if not scores.any():
+            return "non"
+        return self.categories[int(scores.argmax())].lower()
+
+    def __call__(self, result):
+        boxes = result.boxes
+        if boxes is None or not len(boxes):
+            return self.empty()
+        boxes = boxes.cpu().numpy()
+        return self.from_arrays(boxes.xyxy, boxes.conf, boxes.cls)
+
+# ================= MOTION GATE =================
+# Deteksi perubahan murah sebelum YOLO: frame diperkecil, dijadikan
+# grayscale, lalu dibandingkan dengan frame sebelumnya. Kalau tidak ada
+# yang bergerak (dan cooldown sudah lewat), hasil terakhir dipakai lagi.
+class MotionGate:
+    def __init__(self, threshold=0.01, pixel_delta=25, cooldown=1.5, size=(160, 120)):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.cooldown = cooldown
+        self.size = size
+        self.buffers = {}
+        self.last_motion = 0.0
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self.frames_infer = REGISTRY.counter("smartwaste_gate_frames", "Frame yang dicek motion gate", result="infer")
+        self.frames_skip = REGISTRY.counter("smartwaste_gate_frames", "Frame yang dicek motion gate", result="skip")
+
+    def motion_score(self, index, frame):
+        # Semua langkah menulis ke buffer per kamera yang dibuat sekali
+        b = self.buffers.get(index)
+        if b is None:
+            w, h = self.size
+            b = self.buffers[index] = {
+                "small": np.empty((h, w, 3), np.uint8), "gray": np.empty((h, w), np.uint8),
+                "cur": np.empty((h, w), np.uint8), "prev": np.empty((h, w), np.uint8),
+                "diff": np.empty((h, w), np.uint8), "ready": False,
+            }
+        cv2.resize(frame, self.size, dst=b["small"], interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(b["small"], cv2.COLOR_BGR2GRAY, dst=b["gray"])
+        cv2.GaussianBlur(b["gray"], (5, 5), 0, dst=b["cur"])
+        # Tukar: frame ini jadi pembanding berikutnya
+        b["cur"], b["prev"] = b["prev"], b["cur"]
+        if not b["ready"]:
+            b["ready"] = True
+            return 1.0
+        cv2.absdiff(b["prev"], b["cur"], dst=b["diff"])
+        cv2.threshold(b["diff"], self.pixel_delta, 255, cv2.THRESH_BINARY, dst=b["diff"])
+        return cv2.countNonZero(b["diff"]) / b["diff"].size
+
+    def should_infer(self, frames):
+        now = time.monotonic()
+        score = max(self.motion_score(i, f) for i, f in enumerate(frames))
+        moved = score >= self.threshold
+        if moved:
+            self.last_motion = now
+        infer = moved or now - self.last_motion < self.cooldown
+        with self.lock:
+            self.checked += 1
+            if not infer:
+                self.skipped += 1
+        (self.frames_infer if infer else self.frames_skip).inc()
+        return infer
+
+    def snapshot(self, reset=True):
+        with self.lock:
+            data = {"checked": self.checked, "skipped": self.skipped,
+                    "skip_ratio": self.skipped / self.checked if self.checked else 0.0}
+            if reset:
+                self.checked = 0
+                self.skipped = 0
+        return data
+
+# ================= REGION OF INTEREST =================
+# ROI disimpan ternormalisasi (0..1) per index kamera, contoh roi.json:
+# {"0": [[0.25, 0.40, 0.75, 1.0]]}
+def load_rois(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {int(k): [tuple(float(v) for v in box) for box in boxes] for k, boxes in data.items() if boxes}
+
+def save_rois(path, rois):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({str(k): [list(box) for box in boxes] for k, boxes in rois.items()}, f, indent=2)
+
+def roi_to_pixels(roi, shape):
+    h, w = shape[:2]
+    x1, y1, x2, y2 = roi
+    return (int(x1 * w), int(y1 * h), int(math.ceil(x2 * w)), int(math.ceil(y2 * h)))
+
+def intersect(a, b):
+    # Irisan dua box piksel (x1, y1, x2, y2); None kalau luasnya nol
+    box = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    return box if box[0] < box[2] and box[1] < box[3] else None
+
+def merge_parts(parts, iou=0.5):
+    # Gabungkan hasil beberapa crop dari frame yang sama; NMS per kelas
+    # membuang box ganda di area ROI yang saling tumpang tindih.
+    if len(parts) == 1:
+        return parts[0]
+    xyxy = np.concatenate([p[0] for p in parts]).astype(np.float32)
+    conf = np.concatenate([p[1] for p in parts]).astype(np.float32)
+    cls = np.concatenate([p[2] for p in parts])
+    if len(conf) < 2:
+        return xyxy, conf, cls
+    shifted = xyxy + cls[:, None].astype(np.float32) * 4096
+    boxes = np.concatenate([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]], axis=1)
+    idx = np.asarray(cv2.dnn.NMSBoxes(boxes.tolist(), conf.tolist(), 0.0, iou), dtype=np.int64).reshape(-1)
+    return xyxy[idx], conf[idx], cls[idx]
+
+# ================= WASTE DETECTOR =================
+# Backend + post-processing + crop. Untuk tiap frame, detektor dijalankan
+# pada: area track aktif (kalau ada tracker dan bukan frame refresh),
+# atau setiap ROI kamera tersebut, atau full frame kalau tidak ada ROI.
+# Semua crop dari semua kamera masuk ke satu batch.
+class WasteDetector:
+    def __init__(self, backend, waste_map, conf=0.5, class_conf=None, tracks=None, rois=None, imgsz=640):
+        self.backend = backend
+        self.postprocessor = WastePostprocessor(backend.names, waste_map, conf, class_conf)
+        self.tracks = tracks
+        self.rois = rois or {}
+        self.imgsz = imgsz
+        self.inference_latency = REGISTRY.histogram("smartwaste_inference_seconds", "Durasi satu batch model")
+        self.postprocess_latency = REGISTRY.histogram("smartwaste_postprocess_seconds",
+                                                      "Durasi filter, NMS antar crop dan fusi kategori")
+
+    def jobs(self, frames):
+        regions = self.tracks.plan(frames) if self.tracks else [None] * len(frames)
+        jobs = []
+        for i, (frame, region) in enumerate(zip(frames, regions)):
+            # Semua crop dipotong ke batas frame; crop dengan luas nol dibuang
+            # (letterbox tidak bisa me-resize gambar kosong)
+            full = (0, 0, frame.shape[1], frame.shape[0])
+            rois = [box for box in (intersect(roi_to_pixels(roi, frame.shape), full) for roi in self.rois.get(i, ())) if box]
+            if region is not None:
+                region = intersect(region, full)
+            if region is not None and rois:
+                # Area track tidak boleh keluar dari ROI. Kalau track tidak
+                # beririsan dengan ROI mana pun, deteksi di semua ROI saja.
+                boxes = [box for box in (intersect(region, roi) for roi in rois) if box] or rois
+            elif region is not None:
+                boxes = [region]
+            else:
+                boxes = rois
+            if boxes:
+                jobs.extend((i, box) for box in boxes)
+            else:
+                jobs.append((i, None))
+        return jobs
+
+    def input_size(self, inputs, jobs):
+        # Crop kecil tidak perlu di-upscale ke imgsz penuh
+        if any(box is None for _, box in jobs):
+            return self.imgsz
+        side = max(max(img.shape[:2]) for img in inputs)
+        return min(self.imgsz, max(160, int(math.ceil(side / 32)) * 32))
+
+    def __call__(self, frames):
+        jobs = self.jobs(frames)
+        inputs = [frames[i] if box is None else frames[i][box[1]:box[3], box[0]:box[2]] for i, box in jobs]
+        t0 = time.perf_counter()
+        outputs = self.backend.predict_batch(inputs, self.input_size(inputs, jobs), self.postprocessor.min_conf)
+        t1 = time.perf_counter()
+        self.inference_latency.observe(t1 - t0)
+        parts = [[] for _ in frames]
+        for (i, box), (xyxy, conf, cls) in zip(jobs, outputs):
+            if box is not None:
+                # Kembalikan koordinat crop ke koordinat frame penuh
+                xyxy = xyxy + np.array([box[0], box[1], box[0], box[1]], dtype=xyxy.dtype)
+            parts[i].append((xyxy, conf, cls))
+        detections = [self.postprocessor.from_arrays(*merge_parts(p)) for p in parts]
+        waste_type = self.postprocessor.fuse(detections)
+        self.postprocess_latency.observe(time.perf_counter() - t1)
+        return waste_type, detections
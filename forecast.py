@@ -0,0 +1,165 @@
+import collections
+import time
+import types
+
+# ================= TIME-TO-FULL FORECAST =================
+# Perkiraan kapan bak penuh dari tren level isi. Per bak dipakai regresi
+# linear atas jendela geser (WINDOW detik) yang disimpan sebagai jumlah
+# berjalan (n, Σx, Σy, Σx², Σxy): sampel baru ditambahkan dan sampel
+# yang keluar jendela dikurangkan, jadi tiap update O(1).
+#
+# Supaya tahan outlier (tangan di depan sensor, sampah jatuh miring),
+# residual sampel baru dipotong ke ±CLIP x skala residual (gaya Huber)
+# sebelum masuk jumlah. Penurunan tajam di bawah garis tren dianggap bak
+# dikosongkan: jendela direset dan tren dihitung ulang dari nol.
+Forecast = collections.namedtuple("Forecast", "percent rate_per_hour eta full_at points")
+
+class BinForecaster:
+    def __init__(self, window=6 * 3600, sample_every=30.0, min_points=10,
+                 reset_drop=20.0, clip=3.0, min_rate=0.05):
+        self.window = window
+        self.sample_every = sample_every
+        self.min_points = min_points
+        self.reset_drop = reset_drop
+        self.clip = clip
+        self.min_rate = min_rate   # %/jam; lebih lambat dianggap tidak terisi
+        self.points = collections.deque()
+        self.t0 = None
+        self.last_ts = float("-inf")
+        self.scale = None
+        self.resets = 0
+        self._clear_sums()
+
+    def _clear_sums(self):
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def _add(self, x, y):
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+
+    def _remove(self, x, y):
+        self.n -= 1
+        self.sx -= x
+        self.sy -= y
+        self.sxx -= x * x
+        self.sxy -= x * y
+
+    def _rebase(self, ts):
+        # Geser titik nol waktu supaya x tetap kecil (presisi float), jumlah
+        # dihitung ulang dari jendela. Jarang terjadi, jadi amortisasi O(1).
+        shift = ts - self.t0
+        self.t0 = ts
+        self.points = collections.deque((x - shift, y) for x, y in self.points)
+        self._clear_sums()
+        for x, y in self.points:
+            self._add(x, y)
+
+    def fit(self):
+        if self.n < 2:
+            return None
+        den = self.n * self.sxx - self.sx * self.sx
+        if den <= 1e-9:
+            return None
+        slope = (self.n * self.sxy - self.sx * self.sy) / den
+        return (self.sy - slope * self.sx) / self.n, slope
+
+    def reset(self, ts):
+        self.points.clear()
+        self._clear_sums()
+        self.t0 = ts
+        self.scale = None
+        self.resets += 1
+
+    def update(self, ts, percent):
+        if ts - self.last_ts < self.sample_every:
+            return False
+        self.last_ts = ts
+        if self.t0 is None:
+            self.t0 = ts
+        elif ts - self.t0 > 10 * self.window:
+            self._rebase(ts)
+        x = ts - self.t0
+        y = percent
+        fit = self.fit() if self.n >= self.min_points else None
+        if fit:
+            pred = fit[0] + fit[1] * x
+            resid = percent - pred
+            if resid < -self.reset_drop:
+                self.reset(ts)
+                x = 0.0
+            else:
+                limit = self.clip * max(self.scale or abs(resid), 1.0)
+                clipped = max(-limit, min(limit, resid))
+                y = pred + clipped
+                self.scale = abs(clipped) if self.scale is None else self.scale + 0.1 * (abs(clipped) - self.scale)
+        elif self.points and percent < self.points[-1][1] - self.reset_drop:
+            self.reset(ts)
+            x = 0.0
+        self.points.append((x, y))
+        self._add(x, y)
+        while self.points and self.points[0][0] < x - self.window:
+            self._remove(*self.points.popleft())
+        return True
+
+    def forecast(self, now=None):
+        now = time.time() if now is None else now
+        if not self.points:
+            return Forecast(None, None, None, None, 0)
+        fit = self.fit() if self.n >= self.min_points else None
+        if not fit:
+            return Forecast(self.points[-1][1], None, None, None, self.n)
+        level = max(0.0, min(100.0, fit[0] + fit[1] * (now - self.t0)))
+        rate = fit[1] * 3600
+        if level >= 100:
+            eta = 0.0
+        elif rate < self.min_rate:
+            eta = None
+        else:
+            eta = (100 - level) / fit[1]
+        return Forecast(round(level, 1), round(rate, 2), eta, now + eta if eta is not None else None, self.n)
+
+# Satu BinForecaster per bak, diberi makan snapshot CapacitySampler
+# (listener). Hasilnya mapping read-only yang diganti utuh tiap update.
+class CapacityForecaster:
+    def __init__(self, bins, **options):
+        self.forecasters = {jenis: BinForecaster(**options) for jenis in bins}
+        self.latest = types.MappingProxyType({jenis: f.forecast() for jenis, f in self.forecasters.items()})
+
+    def update(self, snapshot):
+        changed = False
+        for jenis, reading in snapshot.bins.items():
+            forecaster = self.forecasters.get(jenis)
+            if forecaster and reading.distance is not None:
+                changed |= forecaster.update(snapshot.timestamp, reading.percent)
+        if changed:
+            self.latest = types.MappingProxyType(
+                {jenis: f.forecast(snapshot.timestamp) for jenis, f in self.forecasters.items()})
+
+    def warm_up(self, history):
+        # Isi jendela dari riwayat terakhir saja (bukan seluruh riwayat)
+        now = time.time()
+        for jenis, forecaster in self.forecasters.items():
+            for p in history.query(jenis, now - forecaster.window, now, 0):
+                forecaster.update(p.ts, p.avg)
+        self.latest = types.MappingProxyType({jenis: f.forecast(now) for jenis, f in self.forecasters.items()})
+
+    def snapshot(self):
+        return self.latest
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--"
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "< 1m"
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}j {minutes}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}h {hours}j"
@@ -0,0 +1,164 @@
+import argparse
+import math
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from backends import InputBuffer
+from detection import MotionGate
+from pipeline import MultiCamera
+
+# ================= DISPLAY BUFFER =================
+# Grid multi-kamera, resize ke ukuran tampilan, dan konversi warna
+# semuanya ditulis ke array tetap. Hasil render() adalah buffer RGBA
+# yang sama setiap frame, sehingga PIL bisa membungkusnya sekali
+# (Image.frombuffer berbagi memori untuk RGBA) lalu cukup paste().
+class DisplayBuffer:
+    def __init__(self, size=(600, 450), canvas_size=(640, 480)):
+        self.size = size
+        self.canvas_size = canvas_size
+        self.canvas = None
+        self.bgr = None
+        self.rgba = None
+
+    def compose(self, frames):
+        if len(frames) == 1:
+            return frames[0]
+        cols = math.ceil(math.sqrt(len(frames)))
+        rows = math.ceil(len(frames) / cols)
+        cw, ch = self.canvas_size
+        tile_w, tile_h = cw // cols, ch // rows
+        if self.canvas is None:
+            self.canvas = np.zeros((ch, cw, 3), dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            r, c = divmod(i, cols)
+            tile = self.canvas[r * tile_h:(r + 1) * tile_h, c * tile_w:(c + 1) * tile_w]
+            cv2.resize(frame, (tile_w, tile_h), dst=tile)
+        return self.canvas
+
+    def render(self, frame, size=None):
+        if size and size != self.size:
+            self.size = size
+            self.rgba = None
+        w, h = self.size
+        if self.rgba is None:
+            self.bgr = np.empty((h, w, 3), np.uint8)
+            self.rgba = np.empty((h, w, 4), np.uint8)
+        if frame.shape[1] == w and frame.shape[0] == h:
+            src = frame
+        else:
+            src = cv2.resize(frame, (w, h), dst=self.bgr, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(src, cv2.COLOR_BGR2RGBA, dst=self.rgba)
+        return self.rgba
+
+# ================= ALLOCATION BENCHMARK =================
+# Cara pakai: python framebuf.py --frames 300 --cameras 2
+# Mengukur alokasi Python/NumPy (tracemalloc) per frame pada jalur
+# capture -> motion gate -> preprocessing -> display, dibandingkan
+# dengan cara lama yang membuat array baru di setiap langkah. Model dan
+# widget Tk tidak ikut diukur; kamera diganti sumber sintetis.
+class SyntheticCapture:
+    def __init__(self, source, shape=(480, 640, 3), fps=60):
+        self.shape = shape
+        self.interval = 1 / fps
+        self.t = 0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        time.sleep(self.interval)
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, np.uint8)
+        # Kotak bergerak supaya motion gate tetap melihat gerakan
+        self.t = (self.t + 8) % (self.shape[1] - 80)
+        image.fill(40)
+        image[200:280, self.t:self.t + 80] = 220
+        return True, image
+
+    def release(self):
+        self.opened = False
+
+def legacy_step(frames, gate_prev, size, display_size):
+    # Jalur lama: setiap langkah mengembalikan array baru
+    frames = [f.copy() for f in frames]
+    for i, f in enumerate(frames):
+        small = cv2.resize(f, (160, 120), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if i in gate_prev:
+            cv2.threshold(cv2.absdiff(gray, gate_prev[i]), 25, 255, cv2.THRESH_BINARY)
+        gate_prev[i] = gray
+    canvases = []
+    for f in frames:
+        canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+        h, w = f.shape[:2]
+        r = min(size / h, size / w)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        top, left = (size - nh) // 2, (size - nw) // 2
+        canvas[top:top + nh, left:left + nw] = cv2.resize(f, (nw, nh))
+        canvases.append(canvas)
+    cv2.dnn.blobFromImages(canvases, 1 / 255.0, swapRB=True)
+    frame = frames[0] if len(frames) == 1 else cv2.resize(frames[0], (640, 480))
+    cv2.cvtColor(cv2.resize(frame, display_size), cv2.COLOR_BGR2RGB)
+
+def measure(step, frames, warmup):
+    for _ in range(warmup):
+        step()
+    transient, retained = [], 0
+    for _ in range(frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()
+        current, peak = tracemalloc.get_traced_memory()
+        transient.append(peak - before)
+        retained += current - before
+    transient.sort()
+    return {
+        "mean_kb": sum(transient) / len(transient) / 1024,
+        "p95_kb": transient[int(0.95 * (len(transient) - 1))] / 1024,
+        "retained_kb": retained / 1024,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark alokasi per frame (tracemalloc)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--cameras", type=int, default=1)
+    parser.add_argument("--imgsz", type=int, default=320)
+    args = parser.parse_args()
+
+    cameras = MultiCamera(list(range(args.cameras)), SyntheticCapture)
+    cameras.start()
+    gate = MotionGate(cooldown=0)
+    inputs = InputBuffer()
+    display = DisplayBuffer()
+
+    # Slot FramePool harus dilepas seperti di DetectionPipeline, kalau
+    # tidak pool terus menambah slot baru
+    def pooled_step():
+        frames = cameras.read()
+        try:
+            gate.should_infer(frames)
+            inputs.fill(frames, args.imgsz)
+            display.render(display.compose(frames))
+        finally:
+            frames.release()
+
+    legacy_prev = {}
+    def legacy():
+        frames = cameras.read()
+        try:
+            legacy_step(frames, legacy_prev, args.imgsz, display.size)
+        finally:
+            frames.release()
+
+    tracemalloc.start()
+    results = {"pooled": measure(pooled_step, args.frames, args.warmup),
+               "legacy": measure(legacy, args.frames, args.warmup)}
+    tracemalloc.stop()
+    cameras.stop()
+    for name, r in results.items():
+        print(f"{name:6s} | alokasi/frame {r['mean_kb']:8.1f} KB (p95 {r['p95_kb']:8.1f}) | tertahan {r['retained_kb']:.1f} KB")
@@ -0,0 +1,188 @@
+import argparse
+import collections
+import csv
+import sqlite3
+import sys
+import threading
+import time
+
+# ================= CAPACITY HISTORY STORE =================
+# Riwayat level isi bak di SQLite (mode WAL). Sampel dari CapacitySampler
+# ditampung di memori dan ditulis per batch setiap FLUSH_EVERY detik dalam
+# satu transaksi, supaya kartu SD tidak ditulis terus-menerus. Saat flush,
+# agregat 1 menit dan 1 jam ikut diperbarui (upsert), dan data lama
+# dibuang sesuai RETENTION.
+RAW = 0
+MINUTE = 60
+HOUR = 3600
+RESOLUTIONS = (RAW, MINUTE, HOUR)
+RETENTION = {RAW: 7 * 86400, MINUTE: 90 * 86400, HOUR: 5 * 365 * 86400}   # detik
+
+HistoryPoint = collections.namedtuple("HistoryPoint", "ts avg min max count")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    jenis TEXT NOT NULL,
+    percent REAL NOT NULL,
+    distance REAL
+);
+CREATE INDEX IF NOT EXISTS samples_jenis_ts ON samples (jenis, ts);
+CREATE TABLE IF NOT EXISTS rollup (
+    resolution INTEGER NOT NULL,
+    jenis TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (resolution, jenis, bucket)
+) WITHOUT ROWID;
+"""
+
+UPSERT_ROLLUP = """
+INSERT INTO rollup (resolution, jenis, bucket, n, total, min, max) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, jenis, bucket) DO UPDATE SET
+    n = n + excluded.n,
+    total = total + excluded.total,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max)
+"""
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL cukup aman di WAL dan jauh lebih sedikit fsync
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class CapacityStore:
+    def __init__(self, path, sample_every=5.0, flush_every=30.0, retention=None):
+        self.path = path
+        self.sample_every = sample_every
+        self.flush_every = flush_every
+        self.retention = dict(RETENTION, **(retention or {}))
+        self.writer = connect(path)
+        self.writer.executescript(SCHEMA)
+        self.reader = connect(path)
+        self.read_lock = threading.Lock()
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.last_sample = 0.0
+        self.last_prune = 0.0
+        self.written = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ----- tulis -----
+    def record(self, snapshot):
+        # Dipanggil dari thread sampler: hanya menambah ke buffer memori
+        if snapshot.timestamp - self.last_sample < self.sample_every:
+            return
+        self.last_sample = snapshot.timestamp
+        rows = [(snapshot.timestamp, jenis, r.percent, r.distance)
+                for jenis, r in snapshot.bins.items() if r.distance is not None]
+        with self.pending_lock:
+            self.pending.extend(rows)
+
+    def flush(self):
+        with self.pending_lock:
+            rows, self.pending = self.pending, []
+        if not rows:
+            return 0
+        buckets = {}
+        for ts, jenis, percent, _ in rows:
+            for res in (MINUTE, HOUR):
+                key = (res, jenis, int(ts // res) * res)
+                agg = buckets.get(key)
+                if agg is None:
+                    buckets[key] = [1, percent, percent, percent]
+                else:
+                    agg[0] += 1
+                    agg[1] += percent
+                    agg[2] = min(agg[2], percent)
+                    agg[3] = max(agg[3], percent)
+        with self.writer:
+            self.writer.executemany("INSERT INTO samples VALUES (?, ?, ?, ?)", rows)
+            self.writer.executemany(UPSERT_ROLLUP, [k + tuple(v) for k, v in buckets.items()])
+        self.written += len(rows)
+        return len(rows)
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        with self.writer:
+            self.writer.execute("DELETE FROM samples WHERE ts < ?", (now - self.retention[RAW],))
+            for res in (MINUTE, HOUR):
+                self.writer.execute("DELETE FROM rollup WHERE resolution = ? AND bucket < ?",
+                                    (res, now - self.retention[res]))
+        self.last_prune = now
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_every):
+            try:
+                self.flush()
+                if time.time() - self.last_prune > HOUR:
+                    self.prune()
+            except sqlite3.Error as e:
+                print("❌ History DB error:", e)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="capacity-history", daemon=True)
+            self.thread.start()
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        self.flush()
+        self.writer.close()
+        self.reader.close()
+
+    # ----- baca -----
+    def pick_resolution(self, span):
+        # Pilih resolusi supaya satu query tidak mengembalikan ribuan titik
+        if span <= 2 * HOUR:
+            return RAW
+        if span <= 3 * 86400:
+            return MINUTE
+        return HOUR
+
+    def query(self, jenis, start=None, end=None, resolution=None):
+        end = time.time() if end is None else end
+        start = end - 86400 if start is None else start
+        if resolution is None:
+            resolution = self.pick_resolution(end - start)
+        with self.read_lock:
+            if resolution == RAW:
+                rows = self.reader.execute(
+                    "SELECT ts, percent, percent, percent, 1 FROM samples "
+                    "WHERE jenis = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    (jenis, start, end)).fetchall()
+            else:
+                rows = self.reader.execute(
+                    "SELECT bucket, total / n, min, max, n FROM rollup "
+                    "WHERE resolution = ? AND jenis = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                    (resolution, jenis, int(start // resolution) * resolution, end)).fetchall()
+        return [HistoryPoint(*row) for row in rows]
+
+    def export_csv(self, out, bins, start=None, end=None, resolution=None):
+        writer = csv.writer(out)
+        writer.writerow(["timestamp", "jenis", "avg", "min", "max", "count"])
+        for jenis in bins:
+            for p in self.query(jenis, start, end, resolution):
+                writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(p.ts)), jenis,
+                                 round(p.avg, 1), round(p.min, 1), round(p.max, 1), p.count])
+
+# Cara pakai: python history.py capacity.db --jenis organik --hours 24 --resolution 60 > organik.csv
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export riwayat kapasitas ke CSV")
+    parser.add_argument("db")
+    parser.add_argument("--jenis", nargs="+", default=["organik", "anorganik", "b3"])
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--resolution", type=int, choices=RESOLUTIONS, default=None)
+    args = parser.parse_args()
+
+    store = CapacityStore(args.db)
+    now = time.time()
+    store.export_csv(sys.stdout, args.jenis, now - args.hours * 3600, now, args.resolution)
@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+
+# ================= METRICS =================
+# Counter dan histogram bucket tetap yang dirender dalam format teks
+# Prometheus. observe() hanya bisect + dua penjumlahan di bawah lock,
+# jadi aman dipanggil per frame. Metrik diambil sekali dari REGISTRY
+# (biasanya di __init__) lalu disimpan, bukan dicari setiap observe.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)   # detik
+# Nama yang diekspos = nama terdaftar + suffix, dipakai sama untuk HELP,
+# TYPE, dan sampel (counter "x" -> x_total)
+KIND_SUFFIX = {"counter": "_total"}
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)   # slot terakhir = +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return HistogramTimer(self)
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        rows, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            rows.append((name + "_bucket", labels + (("le", le),), cumulative))
+        rows.append((name + "_sum", labels, total))
+        rows.append((name + "_count", labels, cumulative))
+        return rows
+
+class HistogramTimer:
+    __slots__ = ("histogram", "t0")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0)
+
+class Gauge:
+    # Nilai dibaca dari fungsi saat scrape (panjang antrian, status koneksi)
+    kind = "gauge"
+
+    def __init__(self, func):
+        self.func = func
+
+    def samples(self, name, labels):
+        try:
+            value = self.func()
+        except Exception:
+            return []
+        return [(name, labels, 0 if value is None else value)]
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.families = {}   # name -> (kind, help, {labels: metric})
+
+    def _get(self, name, help, labels, factory):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = (None, help, {})
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory()
+                if family[0] is None:
+                    self.families[name] = (metric.kind, help, family[2])
+                elif family[0] != metric.kind:
+                    raise ValueError(f"metrik {name} sudah terdaftar sebagai {family[0]}")
+            return metric
+
+    def counter(self, name, help="", **labels):
+        return self._get(name, help, labels, Counter)
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        return self._get(name, help, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name, func, help="", **labels):
+        # Gauge dengan label sama diganti (mis. halaman dibuat ulang)
+        metric = self._get(name, help, labels, lambda: Gauge(func))
+        metric.func = func
+        return metric
+
+    def render(self):
+        with self.lock:
+            families = [(name, kind, help, list(metrics.items())) for name, (kind, help, metrics) in sorted(self.families.items())]
+        lines = []
+        for name, kind, help, metrics in families:
+            name += KIND_SUFFIX.get(kind, "")
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                for sample, sample_labels, value in metric.samples(name, labels):
+                    lines.append(f"{sample}{format_labels(sample_labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+REGISTRY = Registry()
+
+# ================= /metrics ENDPOINT =================
+# HTTP server kecil di thread sendiri. http.server baru diimport saat
+# server dijalankan supaya modul ini tetap ringan untuk pipeline.
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass   # jangan cetak setiap scrape
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"❌ Metrics server gagal di port {port}:", e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📈 Metrics di http://{host or '0.0.0.0'}:{port}/metrics")
+    return server
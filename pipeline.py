@@ -0,0 +1,444 @@
+import collections
+import threading
+import time
+
+from metrics import REGISTRY
+
+# ================= DROP-OLDEST QUEUE =================
+# Antrian kecil antar stage. Kalau penuh, item paling lama dibuang
+# supaya stage berikutnya selalu mengerjakan frame terbaru. Dengan
+# block=True put() justru menunggu sampai ada tempat (replay benchmark,
+# semua frame harus diproses). on_drop dipanggil untuk setiap item yang
+# dibuang (termasuk sisa antrian saat close), supaya slot frame dilepas.
+# wait_demand() membuat producer menunggu sampai consumer benar-benar
+# siap mengambil, jadi frame tidak disalin hanya untuk dibuang.
+class LatestQueue:
+    def __init__(self, maxsize=1, block=False, on_drop=None):
+        self.maxsize = maxsize
+        self.block = block
+        self.on_drop = on_drop
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+        self.takers = 0   # consumer yang sedang menunggu di get()
+
+    def put(self, item):
+        with self.cond:
+            if self.block:
+                while len(self.items) >= self.maxsize and not self.closed:
+                    self.cond.wait()
+            if self.closed:
+                if self.on_drop:
+                    self.on_drop(item)
+                return
+            if len(self.items) >= self.maxsize:
+                old = self.items.popleft()
+                self.dropped += 1
+                if self.on_drop:
+                    self.on_drop(old)
+            self.items.append(item)
+            # notify_all: producer di wait_demand() menunggu di cond yang sama
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.items and not self.closed:
+                self.takers += 1
+                self.cond.notify_all()
+                self.cond.wait(timeout)
+                self.takers -= 1
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            if self.block:
+                # Bangunkan producer yang menunggu tempat
+                self.cond.notify_all()
+            return item
+
+    def wait_demand(self, timeout=None):
+        # True kalau consumer menunggu di antrian kosong (atau antrian ditutup)
+        with self.cond:
+            return self.cond.wait_for(lambda: self.closed or (self.takers and not self.items), timeout)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            if self.on_drop:
+                for item in self.items:
+                    self.on_drop(item)
+                self.items.clear()
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+# ================= STAGE STATISTICS =================
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.count = 0
+        self.busy = 0.0
+        self.window_start = time.perf_counter()
+
+    def record(self, elapsed):
+        with self.lock:
+            self.count += 1
+            self.busy += elapsed
+
+    def snapshot(self, reset=True):
+        with self.lock:
+            now = time.perf_counter()
+            span = max(now - self.window_start, 1e-6)
+            fps = self.count / span
+            avg_ms = (self.busy / self.count * 1000) if self.count else 0.0
+            # busy = porsi waktu stage ini sibuk, mendekati 1.0 berarti bottleneck
+            busy = min(1.0, self.busy / span)
+            if reset:
+                self.count = 0
+                self.busy = 0.0
+                self.window_start = now
+        return {"fps": fps, "avg_ms": avg_ms, "busy": busy}
+
+# ================= PIPELINE STAGE =================
+class Stage(threading.Thread):
+    def __init__(self, pipeline, name, func, inbox=None, outboxes=(), demand=None):
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.pipeline = pipeline
+        self.func = func
+        self.inbox = inbox
+        self.outboxes = outboxes
+        self.demand = demand   # antrian yang consumer-nya harus siap dulu (stage sumber)
+        self.stats = StageStats(name)
+        self.latency = REGISTRY.histogram("smartwaste_stage_seconds", "Durasi satu langkah stage pipeline", stage=name)
+
+    def run(self):
+        while self.pipeline.running:
+            if self.inbox is not None:
+                item = self.inbox.get(timeout=0.1)
+                if item is None:
+                    continue
+            elif self.demand is not None and not self.demand.wait_demand(0.1):
+                # Waktu menunggu consumer tidak dihitung sebagai waktu sibuk
+                continue
+            t0 = time.perf_counter()
+            try:
+                result = self.func(item) if self.inbox is not None else self.func()
+            except Exception as e:
+                print(f"❌ Stage {self.stats.name} error:", e)
+                self.pipeline.stop()
+                break
+            elapsed = time.perf_counter() - t0
+            self.stats.record(elapsed)
+            self.latency.observe(elapsed)
+            if result is None:
+                # Sumber (capture) mengembalikan None berarti stream habis
+                if self.inbox is None:
+                    self.pipeline.stop()
+                    break
+                continue
+            for box in self.outboxes:
+                box.put(result)
+
+# ================= FRAME POOL =================
+# Slot frame yang dialokasikan sekali lalu dipakai ulang, jadi loop
+# capture tidak membuat array baru setiap frame. Slot dipegang paketnya
+# dari capture sampai render selesai (atau sampai paket dibuang antrian)
+# dan baru masuk free-list lagi setelah FrameSet.release(). Inferensi
+# 300 ms pada kamera 30 fps tidak pernah melihat frame-nya ditimpa: kalau
+# semua slot masih dipegang, slot baru dialokasikan.
+class FrameSet(list):
+    # Frame semua kamera untuk satu langkah capture + slot asalnya
+    __slots__ = ("pool", "slot")
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(self.slot)
+            self.pool = None
+
+class FramePool:
+    def __init__(self, slots=6):
+        self.lock = threading.Lock()
+        self.slots = [[] for _ in range(slots)]
+        self.free = list(range(slots))
+        self.allocations = 0
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            self.slots.append([])
+            return len(self.slots) - 1
+
+    def release(self, slot):
+        with self.lock:
+            self.free.append(slot)
+
+    def store(self, slot, index, frame):
+        row = self.slots[slot]
+        if index >= len(row):
+            row.extend([None] * (index + 1 - len(row)))
+        buf = row[index]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = row[index] = frame.copy()
+            self.allocations += 1
+        else:
+            buf[...] = frame
+        return buf
+
+# ================= CAMERA GRABBER =================
+# Satu thread per kamera yang terus membaca dan hanya menyimpan frame
+# terbaru, sehingga stage capture tidak pernah menunggu buffer kamera.
+# Dua buffer bergantian: cap.read() menulis ke buffer belakang, lalu
+# ditukar dengan latest, jadi tidak ada alokasi frame baru per read.
+class CameraGrabber(threading.Thread):
+    def __init__(self, source, open_capture, cond):
+        super().__init__(name=f"grab-{source}", daemon=True)
+        self.source = source
+        self.cap = open_capture(source)
+        self.cond = cond
+        self.latest = None
+        self.back = None
+        self.seq = 0
+        self.alive = True
+
+    def run(self):
+        while self.alive and self.cap.isOpened():
+            ret, frame = self.cap.read(self.back)
+            if not ret:
+                break
+            with self.cond:
+                self.back = self.latest
+                self.latest = frame
+                self.seq += 1
+                self.cond.notify_all()
+        with self.cond:
+            self.alive = False
+            self.cond.notify_all()
+        self.cap.release()
+
+    def stop(self):
+        self.alive = False
+
+class MultiCamera:
+    def __init__(self, sources, open_capture, slots=6):
+        self.cond = threading.Condition()
+        self.grabbers = [CameraGrabber(src, open_capture, self.cond) for src in sources]
+        self.last_seq = [0] * len(self.grabbers)
+        self.pool = FramePool(slots)
+
+    def start(self):
+        for g in self.grabbers:
+            g.start()
+
+    def _ready(self):
+        if not all(g.alive for g in self.grabbers):
+            return True
+        if any(g.latest is None for g in self.grabbers):
+            return False
+        return any(g.seq != self.last_seq[i] for i, g in enumerate(self.grabbers))
+
+    def read(self, timeout=5.0):
+        # Tunggu sampai ada minimal satu kamera dengan frame baru,
+        # lalu salin frame terbaru dari semua kamera ke slot pool yang
+        # bebas (grabber akan menimpa buffernya sendiri). Pemanggil wajib
+        # release() FrameSet setelah selesai.
+        # Index frame = posisi kamera di sources (buffer gate, tracker, ROI,
+        # grid tampilan). Kalau satu kamera mati, stream dihentikan supaya
+        # index kamera lain tidak bergeser.
+        with self.cond:
+            if not self.cond.wait_for(self._ready, timeout):
+                return None
+            dead = [g.source for g in self.grabbers if not g.alive]
+            if dead:
+                print("❌ Kamera berhenti:", ", ".join(str(src) for src in dead))
+                return None
+            frames = FrameSet()
+            frames.pool = self.pool
+            frames.slot = self.pool.acquire()
+            for i, g in enumerate(self.grabbers):
+                frames.append(self.pool.store(frames.slot, i, g.latest))
+                self.last_seq[i] = g.seq
+        return frames
+
+    def stop(self):
+        for g in self.grabbers:
+            g.stop()
+        for g in self.grabbers:
+            if g.is_alive():
+                g.join(timeout=1.0)
+
+# ================= FRAME PACKET =================
+class FramePacket:
+    __slots__ = ("seq", "frame", "t_capture", "waste_type", "detections", "skipped")
+
+    def __init__(self, seq, frame):
+        self.seq = seq
+        self.frame = frame
+        self.t_capture = time.perf_counter()
+        self.waste_type = "non"
+        self.detections = []
+        self.skipped = False
+
+    def release(self):
+        # Kembalikan slot frame ke FramePool (capture dari MultiCamera)
+        release = getattr(self.frame, "release", None)
+        if release:
+            release()
+
+# ================= DETECTION PIPELINE =================
+# capture -> inference -> render
+#                   \--> send
+# Setiap stage jalan di thread sendiri, dihubungkan LatestQueue.
+# render=None melewati stage render sama sekali (daemon headless).
+# Capture baru mengambil frame saat stage infer menunggu antrian kosong
+# (on_demand), jadi kamera live tidak disalin ke pool untuk frame yang
+# akhirnya dibuang; frame tetap yang terbaru karena grabber terus membaca.
+# on_demand=False: capture jalan sesuai tempo sumber dan kelebihan frame
+# dibuang antrian (replay realtime). lossless=True membuat capture
+# menunggu inferensi alih-alih membuang frame, supaya replay benchmark
+# memproses setiap frame. recorder
+# (FrameRecorder) menerima setiap paket setelah inferensi. Paket dilepas
+# (slot frame kembali ke pool) setelah render, setelah infer kalau tanpa
+# render, atau saat dibuang antrian.
+# Kalau ada gate (MotionGate), inferensi dilewati saat scene diam dan
+# hasil terakhir dipakai ulang. Kalau ada tracker (TrackManager), perintah
+# hanya dikirim saat sebuah item terkonfirmasi, bukan setiap frame.
+class DetectionPipeline:
+    SEND_TYPES = ("organik", "anorganik", "b3")
+
+    def __init__(self, capture, detect, render, send=None, on_stop=None,
+                 on_report=None, report_every=5.0, send_queue_size=8, gate=None,
+                 tracker=None, lossless=False, recorder=None, on_demand=True):
+        self.capture = capture
+        self.detect = detect
+        self.gate = gate
+        self.tracker = tracker
+        self.recorder = recorder
+        self.on_demand = on_demand and not lossless
+        self.last_result = None
+        self.render = render
+        self.send = send
+        self.on_stop = on_stop
+        self.on_report = on_report
+        self.report_every = report_every
+        self.running = False
+        self.seq = 0
+        self.stop_lock = threading.Lock()
+        self.stages = []
+        self.queues = {
+            "infer": LatestQueue(1, block=lossless, on_drop=FramePacket.release),
+            "render": LatestQueue(1, block=lossless, on_drop=FramePacket.release),
+            "send": LatestQueue(send_queue_size),
+        }
+
+    def _capture(self):
+        frame = self.capture()
+        if frame is None:
+            return None
+        self.seq += 1
+        return FramePacket(self.seq, frame)
+
+    def _infer(self, packet):
+        infer = self.gate.should_infer(packet.frame) if self.gate else True
+        if infer or self.last_result is None:
+            self.last_result = self.detect(packet.frame)
+        else:
+            packet.skipped = True
+        packet.waste_type, packet.detections = self.last_result
+        if self.recorder:
+            # Sebelum render menggambar box di frame yang sama
+            self.recorder.offer(packet)
+        if self.tracker:
+            # Tracker hanya diberi hasil inferensi baru, bukan hasil yang dipakai ulang
+            if not packet.skipped:
+                for jenis in self.tracker.update(packet.detections):
+                    if self.send:
+                        self.queues["send"].put(jenis)
+        elif self.send and packet.waste_type in self.SEND_TYPES:
+            self.queues["send"].put(packet.waste_type)
+        if not self.render:
+            packet.release()
+        return packet
+
+    def _render(self, packet):
+        try:
+            self.render(packet)
+        finally:
+            packet.release()
+
+    def _send(self, waste_type):
+        # Ambil semua perintah yang sudah antre supaya bisa dikirim satu batch
+        batch = [waste_type]
+        while len(self.queues["send"]):
+            item = self.queues["send"].get(0)
+            if item is None:
+                break
+            batch.append(item)
+        self.send(batch)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        q = self.queues
+        # Tanpa render (mode headless) hasil inferensi tidak diteruskan ke mana-mana
+        self.stages = [
+            Stage(self, "capture", self._capture, None, (q["infer"],), q["infer"] if self.on_demand else None),
+            Stage(self, "infer", self._infer, q["infer"], (q["render"],) if self.render else ()),
+        ]
+        if self.render:
+            self.stages.append(Stage(self, "render", self._render, q["render"]))
+        if self.send:
+            self.stages.append(Stage(self, "send", self._send, q["send"]))
+        for stage in self.stages:
+            stage.start()
+        if self.on_report:
+            threading.Thread(target=self._report_loop, daemon=True).start()
+
+    def stop(self):
+        with self.stop_lock:
+            if not self.running:
+                return
+            self.running = False
+        for q in self.queues.values():
+            q.close()
+        current = threading.current_thread()
+        for stage in self.stages:
+            if stage is not current and stage.is_alive():
+                stage.join(timeout=1.0)
+        if self.on_stop:
+            self.on_stop()
+
+    def stats(self, reset=True):
+        data = {}
+        for stage in self.stages:
+            data[stage.stats.name] = stage.stats.snapshot(reset)
+        data["dropped"] = {name: q.dropped for name, q in self.queues.items()}
+        if self.gate:
+            data["gate"] = self.gate.snapshot(reset)
+        return data
+
+    def report(self, reset=True):
+        data = self.stats(reset)
+        parts = []
+        for stage in self.stages:
+            s = data[stage.stats.name]
+            parts.append(f"{stage.stats.name} {s['fps']:.1f} fps {s['avg_ms']:.0f} ms {s['busy'] * 100:.0f}%")
+        dropped = ", ".join(f"{k}={v}" for k, v in data["dropped"].items())
+        line = " | ".join(parts) + f" | drop {dropped}"
+        if self.gate:
+            g = data["gate"]
+            line += f" | gate skip {g['skipped']}/{g['checked']} ({g['skip_ratio'] * 100:.0f}%)"
+        if self.tracker:
+            line += f" | tracks {self.tracker.active()}"
+        if self.recorder:
+            line += f" | rekam {self.recorder.written} buang {self.recorder.dropped}"
+        return line
+
+    def _report_loop(self):
+        while self.running:
+            time.sleep(self.report_every)
+            if self.running:
+                self.on_report(self.report())
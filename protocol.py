@@ -0,0 +1,368 @@
+import collections
+import json
+import random
+import re
+import socket
+import struct
+import threading
+import time
+
+from metrics import REGISTRY
+
+# ================= FRAMED PROTOCOL =================
+# Setiap pesan = header 20 byte + payload JSON (UTF-8):
+#   magic "SW" | versi (1) | tipe (1) | seq (uint32) | timestamp (float64) | panjang payload (uint32)
+# Dengan panjang di header, dua perintah yang tiba dalam satu recv()
+# tetap terbaca sebagai dua pesan, dan setiap perintah dibalas ACK/NACK
+# berisi seq pesan aslinya.
+MAGIC = b"SW"
+VERSION = 1
+HEADER = struct.Struct("!2sBBIdI")
+MAX_PAYLOAD = 1 << 20
+
+HELLO = 1
+HELLO_ACK = 2
+COMMAND = 3
+BATCH = 4
+ACK = 5
+NACK = 6
+PING = 7
+PONG = 8
+CAPACITY = 9   # minta level isi + perkiraan penuh; dibalas CAPACITY dengan data per bak
+SUBSCRIBE = 10   # {"topics": ["capacity"], "threshold": 1.0}: Pi lalu push CAPACITY (delta) sendiri
+
+TYPE_NAMES = {
+    HELLO: "HELLO", HELLO_ACK: "HELLO_ACK", COMMAND: "COMMAND", BATCH: "BATCH",
+    ACK: "ACK", NACK: "NACK", PING: "PING", PONG: "PONG", CAPACITY: "CAPACITY",
+    SUBSCRIBE: "SUBSCRIBE",
+}
+
+LID_TYPES = ("organik", "anorganik", "b3")
+
+class ProtocolError(Exception):
+    pass
+
+class Message:
+    __slots__ = ("type", "seq", "timestamp", "payload")
+
+    def __init__(self, msg_type, seq, timestamp, payload):
+        self.type = msg_type
+        self.seq = seq
+        self.timestamp = timestamp
+        self.payload = payload
+
+    def __repr__(self):
+        return f"<{TYPE_NAMES.get(self.type, self.type)} seq={self.seq} {self.payload}>"
+
+def encode(msg_type, seq, payload=None, timestamp=None):
+    body = json.dumps(payload if payload is not None else {}, separators=(",", ":")).encode()
+    header = HEADER.pack(MAGIC, VERSION, msg_type, seq & 0xFFFFFFFF,
+                         time.time() if timestamp is None else timestamp, len(body))
+    return header + body
+
+class FrameDecoder:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        while len(self.buffer) >= HEADER.size:
+            magic, version, msg_type, seq, ts, length = HEADER.unpack_from(self.buffer)
+            if magic != MAGIC or version != VERSION:
+                raise ProtocolError(f"header tidak valid: {bytes(self.buffer[:HEADER.size])!r}")
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"payload terlalu besar: {length}")
+            end = HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            payload = json.loads(bytes(self.buffer[HEADER.size:end]) or b"{}")
+            del self.buffer[:end]
+            messages.append(Message(msg_type, seq, ts, payload))
+        return messages
+
+def command(jenis, action="buka"):
+    return {"action": action, "jenis": jenis}
+
+# ================= LEGACY TEXT SHIM =================
+# Klien lama mengirim teks mentah tanpa pemisah, misalnya "HELLO" atau
+# "BUKA:organikBUKA:b3". Teks dipecah menjadi pesan yang sama seperti
+# versi biner supaya server cukup punya satu jalur eksekusi.
+LEGACY_PATTERN = re.compile(r"(hello|(buka|tutup):(anorganik|organik|b3))", re.IGNORECASE)
+
+def is_framed(first_bytes):
+    return first_bytes[:len(MAGIC)] == MAGIC[:len(first_bytes)]
+
+class LegacyDecoder:
+    def __init__(self):
+        self.buffer = ""
+        self.seq = 0
+
+    def feed(self, data):
+        self.buffer += data.decode(errors="ignore")
+        messages = []
+        last = 0
+        for m in LEGACY_PATTERN.finditer(self.buffer):
+            self.seq += 1
+            if m.group(1).lower() == "hello":
+                messages.append(Message(HELLO, self.seq, time.time(), {"legacy": True}))
+            else:
+                messages.append(Message(COMMAND, self.seq, time.time(),
+                                        command(m.group(3).lower(), m.group(2).lower())))
+            last = m.end()
+        # Sisakan potongan yang mungkin perintah terpotong (mis. "BUKA:org")
+        rest = self.buffer[last:]
+        self.buffer = rest[-16:] if len(rest) > 16 else rest
+        return messages
+
+def legacy_reply(message):
+    # Klien lama hanya mengenal balasan "OK" untuk HELLO
+    return b"OK" if message.type == HELLO else b""
+
+# ================= MESSAGE CHANNEL =================
+# Pembungkus socket blocking: seq otomatis, kirim thread-safe, dan
+# recv() yang selalu mengembalikan satu pesan utuh.
+class MessageChannel:
+    def __init__(self, sock):
+        self.sock = sock
+        self.decoder = FrameDecoder()
+        self.inbox = []
+        self.seq = 0
+        self.send_lock = threading.Lock()
+        self.send_latency = REGISTRY.histogram("smartwaste_socket_send_seconds", "Durasi sendall satu pesan")
+        self.bytes_sent = REGISTRY.counter("smartwaste_socket_sent_bytes", "Byte terkirim lewat socket")
+
+    def next_seq(self):
+        # Seq dipesan sebelum kirim, supaya pemanggil bisa mencatatnya dulu
+        with self.send_lock:
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            return self.seq
+
+    def send(self, msg_type, payload=None, seq=None):
+        with self.send_lock:
+            if seq is None:
+                self.seq = (self.seq + 1) & 0xFFFFFFFF
+                seq = self.seq
+            data = encode(msg_type, seq, payload)
+            t0 = time.perf_counter()
+            self.sock.sendall(data)
+            self.send_latency.observe(time.perf_counter() - t0)
+            self.bytes_sent.inc(len(data))
+        return seq
+
+    def send_commands(self, commands, seq=None):
+        # Beberapa perintah sekaligus dikirim dalam satu BATCH
+        if len(commands) == 1:
+            return self.send(COMMAND, commands[0], seq)
+        return self.send(BATCH, {"commands": commands}, seq)
+
+    def recv(self):
+        while not self.inbox:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionError("koneksi ditutup")
+            self.inbox.extend(self.decoder.feed(data))
+        return self.inbox.pop(0)
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+# ================= CLIENT CONNECTION MANAGER =================
+# Koneksi laptop -> Raspberry Pi yang menyambung ulang sendiri dengan
+# exponential backoff + jitter. Selama terputus, perintah ditampung di
+# antrian terbatas tanpa duplikat lalu dikirim ulang berurutan saat
+# koneksi kembali. submit() tidak pernah blok atau melempar error,
+# jadi deteksi tetap jalan walau Wi-Fi putus.
+class RaspberryLink:
+    def __init__(self, host, port, max_queue=16, max_age=None, backoff_min=0.5, backoff_max=30.0,
+                 connect_timeout=5.0, ping_interval=30.0):
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.max_age = max_age
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.ping_interval = ping_interval
+        self.outbox = collections.deque()
+        self.cond = threading.Condition()
+        self.pending = {}   # seq -> (item outbox, waktu kirim); diakses di bawah cond
+        self.channel = None
+        self.connected = False
+        self.running = False
+        self.dropped = 0
+        self.on_state = None
+        self.on_reply = None
+        # Payload SUBSCRIBE yang dikirim ulang setiap tersambung, dan
+        # callback on_capacity(payload) untuk setiap push CAPACITY dari Pi
+        self.subscription = None
+        self.on_capacity = None
+        self.rtt = REGISTRY.histogram("smartwaste_command_rtt_seconds", "Kirim perintah sampai ACK/NACK dari Pi")
+        self.replies = {t: REGISTRY.counter("smartwaste_command_replies", "Balasan perintah dari Pi", result=name)
+                        for t, name in ((ACK, "ack"), (NACK, "nack"))}
+        REGISTRY.gauge("smartwaste_link_connected", lambda: self.connected, "1 kalau terhubung ke Pi")
+        REGISTRY.gauge("smartwaste_link_queued", self.queued, "Perintah yang menunggu dikirim")
+        REGISTRY.gauge("smartwaste_link_dropped", lambda: self.dropped, "Perintah dibuang (antrian penuh/kedaluwarsa)")
+
+    # ----- API -----
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        threading.Thread(target=self.run, name="raspberry-link", daemon=True).start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.channel:
+            self.channel.close()
+
+    def submit(self, commands):
+        now = time.monotonic()
+        with self.cond:
+            for cmd in commands:
+                key = (cmd.get("action"), cmd.get("jenis"))
+                # Perintah yang sama masih antre -> cukup satu
+                if any(k == key for k, _, _ in self.outbox):
+                    continue
+                if len(self.outbox) >= self.max_queue:
+                    self.outbox.popleft()
+                    self.dropped += 1
+                self.outbox.append((key, cmd, now))
+            self.cond.notify_all()
+
+    def queued(self):
+        return len(self.outbox)
+
+    # ----- internal -----
+    def _set_state(self, connected, detail=""):
+        self.connected = connected
+        if self.on_state:
+            self.on_state(connected, detail)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        channel = MessageChannel(sock)
+        try:
+            channel.send(HELLO, {"client": "laptop"})
+            resp = channel.recv()
+            if resp.type != HELLO_ACK:
+                raise ProtocolError("Handshake gagal")
+            if self.subscription:
+                channel.send(SUBSCRIBE, self.subscription)
+                resp = channel.recv()
+                if resp.type != ACK:
+                    # Pi versi lama: tetap tersambung, hanya tanpa push
+                    print("⚠️ Raspberry Pi menolak SUBSCRIBE:", resp.payload)
+            sock.settimeout(None)
+        except Exception:
+            channel.close()
+            raise
+        return channel
+
+    def run(self):
+        delay = self.backoff_min
+        while self.running:
+            try:
+                self.channel = self._connect()
+            except Exception as e:
+                self._set_state(False, f"gagal terhubung ({e}), coba lagi {delay:.1f}s")
+                with self.cond:
+                    self.cond.wait(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.backoff_max)
+                continue
+            delay = self.backoff_min
+            self._set_state(True, f"{self.host}:{self.port}")
+            alive = threading.Event()
+            alive.set()
+            threading.Thread(target=self._read_loop, args=(self.channel, alive), daemon=True).start()
+            try:
+                self._pump(self.channel, alive)
+            except Exception as e:
+                print("❌ Socket error:", e)
+            self.channel.close()
+            self.channel = None
+            self._requeue_unacked()
+            if self.running:
+                self._set_state(False, "terputus, menyambung ulang...")
+
+    def _requeue_unacked(self):
+        # Perintah yang sudah terkirim tapi belum di-ACK ikut dikirim ulang,
+        # dengan waktu antre aslinya supaya max_age tetap berlaku
+        with self.cond:
+            pending, self.pending = self.pending, {}
+            for seq in sorted(pending, reverse=True):
+                for item in reversed(pending[seq][0]):
+                    if not any(k == item[0] for k, _, _ in self.outbox):
+                        self.outbox.appendleft(item)
+            while len(self.outbox) > self.max_queue:
+                self.outbox.pop()
+                self.dropped += 1
+
+    def _take_batch(self):
+        now = time.monotonic()
+        batch = []
+        while self.outbox:
+            item = self.outbox.popleft()
+            if self.max_age is not None and now - item[2] > self.max_age:
+                self.dropped += 1
+                continue
+            batch.append(item)
+        return batch
+
+    def _pump(self, channel, alive):
+        last_sent = time.monotonic()
+        while self.running and alive.is_set():
+            with self.cond:
+                if not self.outbox:
+                    self.cond.wait(1.0)
+                batch = self._take_batch()
+            if not batch:
+                if time.monotonic() - last_sent > self.ping_interval:
+                    channel.send(PING)
+                    last_sent = time.monotonic()
+                continue
+            commands = [cmd for _, cmd, _ in batch]
+            # Catat di pending sebelum sendall: ACK bisa datang sebelum
+            # send_commands kembali. Kalau kirim gagal, batch tetap di
+            # pending dan dikembalikan ke depan antrian oleh _requeue_unacked.
+            seq = channel.next_seq()
+            with self.cond:
+                self.pending[seq] = (batch, time.perf_counter())
+            channel.send_commands(commands, seq)
+            last_sent = time.monotonic()
+            print(f"📤 Kirim ke Raspberry (seq {seq}):", ", ".join(f"{c['action'].upper()}:{c['jenis']}" for c in commands))
+
+    def _read_loop(self, channel, alive):
+        # Baca ACK/NACK dari Raspberry Pi: tahu apakah tutup benar-benar bergerak
+        try:
+            while True:
+                msg = channel.recv()
+                if msg.type == CAPACITY:
+                    if self.on_capacity:
+                        self.on_capacity(msg.payload)
+                    continue
+                if msg.type not in (ACK, NACK):
+                    continue
+                seq = msg.payload.get("ack", msg.seq)
+                with self.cond:
+                    _, t_sent = self.pending.pop(seq, (None, None))
+                latency = (time.perf_counter() - t_sent) * 1000 if t_sent else None
+                self.replies[msg.type].inc()
+                if latency is not None:
+                    self.rtt.observe(latency / 1000)
+                if self.on_reply:
+                    self.on_reply(msg, latency)
+        except Exception:
+            pass
+        finally:
+            alive.clear()
+            with self.cond:
+                self.cond.notify_all()
@@ -0,0 +1,247 @@
+import argparse
+import heapq
+import random
+import statistics
+import threading
+import time
+
+from metrics import REGISTRY
+
+SPEED_FACTOR = 17150   # cm per detik lebar pulsa echo (343 m/s, pulang-pergi)
+ECHO_TIMEOUT = 0.04    # HC-SR04: echo maksimum ~23 ms (4 m) + jeda awal
+
+# ================= GPIO BACKENDS =================
+# Backend menyediakan setup_output/setup_input, output, input, dan
+# watch(pin, callback). callback(level, t) dipanggil di setiap tepi
+# sinyal dengan t dari time.perf_counter(), bukan time.time(). level
+# dibaca saat callback berjalan, bukan saat tepi terjadi, jadi untuk
+# pulsa pendek bisa sudah berubah; jangan dipakai menentukan jenis tepi.
+class RpiGpio:
+    def __init__(self, gpio):
+        self.gpio = gpio
+        gpio.setmode(gpio.BCM)
+        gpio.setwarnings(False)
+
+    def setup_output(self, pin):
+        self.gpio.setup(pin, self.gpio.OUT)
+        self.gpio.output(pin, False)
+
+    def setup_input(self, pin):
+        self.gpio.setup(pin, self.gpio.IN)
+
+    def output(self, pin, level):
+        self.gpio.output(pin, level)
+
+    def input(self, pin):
+        return self.gpio.input(pin)
+
+    def watch(self, pin, callback):
+        def on_edge(channel):
+            # Timestamp diambil paling awal, sebelum membaca level
+            t = time.perf_counter()
+            callback(self.gpio.input(channel), t)
+        self.gpio.add_event_detect(pin, self.gpio.BOTH, callback=on_edge)
+
+    def unwatch(self, pin):
+        self.gpio.remove_event_detect(pin)
+
+# Sensor palsu untuk laptop / tes tanpa hardware. Setelah pulsa trigger,
+# echo naik ECHO_DELAY detik kemudian lalu turun setelah lebar pulsa yang
+# sesuai jarak. Tepi dikirim dari satu thread penjadwal, sama seperti
+# thread callback RPi.GPIO, jadi keterlambatan callback ikut teruji.
+class SimulatedGpio:
+    ECHO_DELAY = 0.00045
+
+    def __init__(self, jitter=0.0):
+        self.jitter = jitter
+        self.sensors = {}
+        self.levels = {}
+        self.pulses = {}
+        self.callbacks = {}
+        self.events = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, name="gpio-sim", daemon=True).start()
+
+    def attach(self, trig, echo, distance):
+        # distance: angka (cm), fungsi tanpa argumen -> cm, atau None (tidak ada pantulan)
+        self.sensors[trig] = (echo, distance)
+
+    def setup_output(self, pin):
+        self.levels[pin] = 0
+
+    def setup_input(self, pin):
+        self.levels.setdefault(pin, 0)
+
+    def output(self, pin, level):
+        prev = self.levels.get(pin, 0)
+        self.levels[pin] = 1 if level else 0
+        if prev and not level and pin in self.sensors:
+            self._echo(pin)
+
+    def input(self, pin):
+        # Level pin dihitung dari jadwal pulsa, seperti pin fisik yang
+        # tidak bergantung pada kapan thread callback sempat berjalan
+        pulse = self.pulses.get(pin)
+        if pulse is not None:
+            return 1 if pulse[0] <= time.perf_counter() < pulse[1] else 0
+        return self.levels.get(pin, 0)
+
+    def watch(self, pin, callback):
+        self.callbacks[pin] = callback
+
+    def unwatch(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def _echo(self, trig):
+        echo, distance = self.sensors[trig]
+        if callable(distance):
+            distance = distance()
+        if distance is None:
+            return
+        rise = time.perf_counter() + self.ECHO_DELAY
+        fall = rise + distance / SPEED_FACTOR
+        if self.jitter:
+            fall += random.uniform(-self.jitter, self.jitter)
+        with self.cond:
+            self.pulses[echo] = (rise, fall)
+            for t, level in ((rise, 1), (fall, 0)):
+                self.seq += 1
+                heapq.heappush(self.events, (t, self.seq, echo, level))
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.events:
+                    self.cond.wait()
+                t, _, pin, level = self.events[0]
+                delay = t - time.perf_counter()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                heapq.heappop(self.events)
+                callback = self.callbacks.get(pin)
+            if callback:
+                # Seperti RpiGpio.watch: level dibaca saat callback berjalan,
+                # bisa sudah berubah lagi untuk pulsa pendek
+                t = time.perf_counter()
+                callback(self.input(pin), t)
+
+# ================= ECHO RANGER =================
+# Mengukur lebar pulsa echo dari timestamp tepi naik/turun yang dicatat
+# di callback GPIO. Thread pemanggil hanya menunggu Event, tidak polling
+# GPIO.input() dalam loop, jadi CPU tetap bebas selama pengukuran.
+# Timestamp diambil saat callback berjalan, jadi akurasinya dibatasi
+# latensi thread callback: di simulasi rata-rata error ~1-2 cm dengan
+# outlier puluhan cm (polling lebih akurat, tapi makan CPU). Outlier
+# diredam median filter di CapacitySampler.
+class EchoRanger:
+    def __init__(self, gpio, trig, echo, timeout=ECHO_TIMEOUT):
+        self.gpio = gpio
+        self.trig = trig
+        self.echo = echo
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.armed = False
+        self.edges = 0
+        self.rise = None
+        self.fall = None
+        self.timeouts = 0
+        self.latency = REGISTRY.histogram("smartwaste_ultrasonic_seconds", "Durasi satu pengukuran jarak", echo=echo)
+        self.timeout_count = REGISTRY.counter("smartwaste_ultrasonic_timeouts", "Echo tidak kembali", echo=echo)
+        gpio.setup_output(trig)
+        gpio.setup_input(echo)
+        gpio.watch(echo, self._edge)
+
+    def _edge(self, level, t):
+        # Jenis tepi dari urutannya setelah trigger (pertama naik, kedua
+        # turun), bukan dari level: echo 2-5 cm sudah turun lagi sebelum
+        # callback tepi naik sempat membaca pin.
+        if not self.armed:
+            return
+        self.edges += 1
+        if self.edges == 1:
+            self.rise = t
+        elif self.edges == 2:
+            self.fall = t
+            self.armed = False
+            self.done.set()
+
+    def measure(self):
+        with self.lock:
+            t0 = time.perf_counter()
+            self.rise = self.fall = None
+            # Echo yang masih tinggi dari pengukuran sebelumnya: tepi turunnya dilewati
+            self.edges = -1 if self.gpio.input(self.echo) else 0
+            self.done.clear()
+            self.armed = True
+            self.gpio.output(self.trig, True)
+            time.sleep(0.00001)
+            self.gpio.output(self.trig, False)
+            ok = self.done.wait(self.timeout)
+            self.armed = False
+            self.latency.observe(time.perf_counter() - t0)
+            if not ok:
+                self.timeouts += 1
+                self.timeout_count.inc()
+                return None
+            return round((self.fall - self.rise) * SPEED_FACTOR, 1)
+
+    def close(self):
+        self.gpio.unwatch(self.echo)
+
+# ================= BENCHMARK (SIMULASI) =================
+# Cara pakai: python ranging.py --samples 200 --distance 12.5
+# Membandingkan akurasi dan pemakaian CPU EchoRanger dengan cara lama
+# (busy-wait GPIO.input) di atas SimulatedGpio.
+def poll_distance(gpio, trig, echo, timeout=0.03):
+    gpio.output(trig, True)
+    time.sleep(0.00001)
+    gpio.output(trig, False)
+    start = time.time()
+    while gpio.input(echo) == 0:
+        if time.time() - start > timeout:
+            return None
+    t1 = time.time()
+    while gpio.input(echo) == 1:
+        if time.time() - t1 > timeout:
+            return None
+    return round((time.time() - t1) * SPEED_FACTOR, 1)
+
+def run_benchmark(measure, samples, distance, interval):
+    errors = []
+    misses = 0
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(samples):
+        value = measure()
+        if value is None:
+            misses += 1
+        else:
+            errors.append(abs(value - distance))
+        time.sleep(interval)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    return {
+        "mean_err_cm": statistics.mean(errors) if errors else None,
+        "max_err_cm": max(errors) if errors else None,
+        "misses": misses,
+        "cpu_pct": cpu / wall * 100,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ranging ultrasonik dengan GPIO simulasi")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--distance", type=float, default=12.5, help="jarak simulasi (cm)")
+    parser.add_argument("--interval", type=float, default=0.01, help="jeda antar pengukuran (detik)")
+    args = parser.parse_args()
+
+    gpio = SimulatedGpio()
+    gpio.attach(5, 6, args.distance)
+    ranger = EchoRanger(gpio, 5, 6)
+    results = {"edge": run_benchmark(ranger.measure, args.samples, args.distance, args.interval)}
+    ranger.close()
+    results["poll"] = run_benchmark(lambda: poll_distance(gpio, 5, 6), args.samples, args.distance, args.interval)
+    for name, r in results.items():
+        err = "-" if r["mean_err_cm"] is None else f"{r['mean_err_cm']:.2f} cm (max {r['max_err_cm']:.2f})"
+        print(f"{name:5s} | error {err} | miss {r['misses']} | CPU {r['cpu_pct']:.0f}%")
@@ -0,0 +1,191 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+import cv2
+
+from metrics import REGISTRY
+
+# ================= FRAME RECORDER =================
+# Menyimpan frame (mentah dan/atau beranotasi) + metadata deteksi untuk
+# dataset latih ulang. offer() dipanggil dari stage infer: hanya cek
+# trigger, salin frame, lalu put_nowait ke antrian terbatas. Kalau antrian
+# penuh frame dibuang (dihitung), pipeline live tidak pernah menunggu
+# disk. Encode JPEG, anotasi, dan tulis file dikerjakan thread writer.
+#
+# Struktur: <out_dir>/<sesi>/seg_0001/{cam0_000001.jpg, metadata.jsonl}
+# Segmen baru dibuat setiap segment_mb; kalau total melebihi max_mb,
+# segmen paling lama dihapus.
+MODES = ("detections", "sample", "both")
+
+def boxes(detections):
+    # Detections -> (x1, y1, x2, y2, kategori, kelas, conf); list kosong
+    # kalau model belum siap (detect mengembalikan list biasa)
+    if not len(detections):
+        return []
+    return [row + (conf,) for row, conf in zip(detections, detections.conf.tolist())]
+
+class FrameRecorder:
+    def __init__(self, out_dir="recordings", mode="detections", sample_every=2.0, min_interval=0.5,
+                 save_raw=True, save_annotated=False, queue_size=32, segment_mb=256, max_mb=2048,
+                 jpeg_quality=90, colors=None):
+        if mode not in MODES:
+            raise ValueError(f"mode rekam tidak dikenal: {mode}")
+        self.out_dir = out_dir
+        self.mode = mode
+        self.sample_every = sample_every
+        self.min_interval = min_interval   # jeda minimum antar rekaman karena deteksi
+        self.save_raw = save_raw
+        self.save_annotated = save_annotated
+        self.segment_bytes = segment_mb * 1024 * 1024
+        self.max_bytes = max_mb * 1024 * 1024
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.colors = colors or {}
+        self.queue = queue.Queue(queue_size)
+        self.session = os.path.join(out_dir, time.strftime("%Y%m%d-%H%M%S"))
+        self.segments = []   # [(path, bytes)] urut dari yang tertua
+        self.segment = None
+        self.segment_size = 0
+        self.metadata = None
+        self.last_detection = 0.0
+        self.last_sample = 0.0
+        self.count = 0
+        self.offered = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes = 0
+        self.removed = 0
+        self.drop_counter = REGISTRY.counter("smartwaste_recorder_dropped", "Frame rekaman dibuang (antrian penuh)")
+        self.write_latency = REGISTRY.histogram("smartwaste_recorder_write_seconds", "Encode + tulis satu frame rekaman")
+        self.thread = threading.Thread(target=self.run, name="frame-recorder", daemon=True)
+        self.thread.start()
+
+    # ----- sisi pipeline -----
+    def trigger(self, packet, now):
+        if self.mode != "sample" and not packet.skipped and any(len(d) for d in packet.detections):
+            if now - self.last_detection >= self.min_interval:
+                self.last_detection = now
+                return "detection"
+        if self.mode != "detections" and now - self.last_sample >= self.sample_every:
+            self.last_sample = now
+            return "sample"
+        return None
+
+    def offer(self, packet):
+        now = time.monotonic()
+        reason = self.trigger(packet, now)
+        if reason is None:
+            return False
+        self.offered += 1
+        if self.queue.full():
+            # Jangan salin frame yang toh akan dibuang
+            self.dropped += 1
+            self.drop_counter.inc()
+            return False
+        # Slot FramePool masih dipegang paket ini, jadi frame = frame yang
+        # dideteksi. Tetap disalin karena render akan menggambar box langsung
+        # di frame ini dan slot kembali ke pool setelah render.
+        item = (packet.seq, time.time(), reason, packet.waste_type, not packet.skipped,
+                [f.copy() for f in packet.frame], list(packet.detections))
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            self.drop_counter.inc()
+            return False
+        return True
+
+    # ----- thread writer -----
+    def _new_segment(self):
+        if self.metadata:
+            self.metadata.close()
+            self.segments.append((self.segment, self.segment_size))
+        self.segment = os.path.join(self.session, f"seg_{len(self.segments) + self.removed + 1:04d}")
+        os.makedirs(self.segment, exist_ok=True)
+        self.segment_size = 0
+        self.metadata = open(os.path.join(self.segment, "metadata.jsonl"), "a", encoding="utf-8")
+        # Batas total: hapus segmen lama (yang sedang ditulis tidak ikut dihitung)
+        total = sum(size for _, size in self.segments)
+        while self.segments and total + self.segment_bytes > self.max_bytes:
+            path, size = self.segments.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.removed += 1
+
+    def annotate(self, frame, detections):
+        frame = frame.copy()
+        for x1, y1, x2, y2, kategori, class_name, conf in boxes(detections):
+            color = self.colors.get(kategori, (0, 255, 0))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f"{class_name} {conf:.2f}", (x1, max(0, y1 - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return frame
+
+    def _write_image(self, name, frame):
+        ok, buf = cv2.imencode(".jpg", frame, self.params)
+        if not ok:
+            raise ValueError(f"encode {name} gagal")
+        with open(os.path.join(self.segment, name), "wb") as f:
+            f.write(buf)
+        self.segment_size += len(buf)
+        self.bytes += len(buf)
+        return name
+
+    def _write(self, item):
+        seq, ts, reason, waste_type, inferred, frames, detections = item
+        if self.segment is None or self.segment_size >= self.segment_bytes:
+            self._new_segment()
+        for cam, (frame, det) in enumerate(zip(frames, detections)):
+            self.count += 1
+            record = {
+                # inferred False = frame dilewati motion gate, deteksi dari frame sebelumnya
+                "time": ts, "seq": seq, "camera": cam, "trigger": reason, "waste_type": waste_type, "inferred": inferred,
+                "width": frame.shape[1], "height": frame.shape[0],
+                "detections": [{"box": [x1, y1, x2, y2], "category": kategori.lower(), "class": class_name,
+                                "conf": round(conf, 3)}
+                               for x1, y1, x2, y2, kategori, class_name, conf in boxes(det)],
+            }
+            if self.save_raw:
+                record["raw"] = self._write_image(f"cam{cam}_{self.count:06d}.jpg", frame)
+            if self.save_annotated:
+                record["annotated"] = self._write_image(f"cam{cam}_{self.count:06d}_ann.jpg", self.annotate(frame, det))
+            line = json.dumps(record) + "\n"
+            self.metadata.write(line)
+            self.segment_size += len(line)
+        self.metadata.flush()
+        self.written += 1
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            t0 = time.perf_counter()
+            try:
+                self._write(item)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                print("❌ Gagal menulis rekaman:", e)
+            self.write_latency.observe(time.perf_counter() - t0)
+        if self.metadata:
+            self.metadata.close()
+
+    def close(self):
+        # Sisa antrian tetap ditulis sebelum berhenti
+        self.queue.put(None)
+        self.thread.join(timeout=10.0)
+        print("🎥", self.summary())
+
+    def summary(self):
+        line = (f"rekam {self.written}/{self.offered} trigger ({self.bytes / 1024 / 1024:.1f} MB) di {self.session}"
+                f" | buang {self.dropped} (antrian penuh)")
+        if self.offered:
+            line += f" {self.dropped / self.offered * 100:.0f}%"
+        if self.errors:
+            line += f" | gagal tulis {self.errors}"
+        if self.removed:
+            line += f" | {self.removed} segmen lama dihapus"
+        return line
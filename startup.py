@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+STARTUP_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup.jsonl")
+
+def git_commit(cwd=None):
+    # Hash commit pendek untuk membandingkan hasil ukur antar rilis
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=cwd or os.path.dirname(os.path.abspath(__file__)), timeout=2)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+# ================= STARTUP TIMING =================
+# Mencatat lama import per kelompok modul dan titik-titik penting sejak
+# baris pertama entry point (window pertama tampil, model siap). Setiap
+# laporan ditambahkan satu baris JSON ke STARTUP_LOG supaya cold start
+# bisa dibandingkan antar rilis.
+class StartupTimer:
+    def __init__(self, entry, log_path=STARTUP_LOG):
+        self.entry = entry
+        self.log_path = log_path
+        self.t0 = time.perf_counter()
+        self.imports = []
+        self.marks = []
+        self.reported = False
+
+    @contextmanager
+    def importing(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.imports.append((name, time.perf_counter() - t))
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.t0))
+
+    def commit(self):
+        return git_commit(os.path.dirname(self.log_path))
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        print(f"⏱️ Startup {self.entry}:")
+        for name, sec in self.imports:
+            print(f"   import {name:<20s} {sec * 1000:8.0f} ms")
+        for label, sec in self.marks:
+            print(f"   {label:<27s} {sec * 1000:8.0f} ms")
+        record = {
+            "entry": self.entry,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": self.commit(),
+            "python": sys.version.split()[0],
+            "imports_ms": {name: round(sec * 1000, 1) for name, sec in self.imports},
+            "marks_ms": {label: round(sec * 1000, 1) for label, sec in self.marks},
+        }
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print("❌ Gagal menulis log startup:", e)
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("customtkinter")
+
+import RPI4B_Code
+from protocol import FrameDecoder, encode, HELLO, HELLO_ACK, NACK, PING, PONG, SUBSCRIBE
+
+# ================= COMMAND SERVER: PESAN RUSAK =================
+# Cara pakai: python -m pytest test_command_server.py (butuh customtkinter)
+# SUBSCRIBE dengan threshold bukan angka harus di-NACK, pesan berikutnya
+# tetap dilayani, dan klien dibersihkan setelah socket ditutup.
+class FakeSampler:
+    def add_listener(self, listener):
+        pass
+
+class FakeApp:
+    capacity = FakeSampler()
+
+async def exchange(server, messages, expected):
+    listener = await asyncio.start_server(server.handle_client, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for msg_type, seq, payload in messages:
+        writer.write(encode(msg_type, seq, payload))
+    await writer.drain()
+    decoder = FrameDecoder()
+    replies = []
+    while len(replies) < expected:
+        data = await asyncio.wait_for(reader.read(65536), 5)
+        if not data:
+            break
+        replies.extend(decoder.feed(data))
+    writer.close()
+    await writer.wait_closed()
+    for _ in range(50):
+        if not server.clients:
+            break
+        await asyncio.sleep(0.05)
+    listener.close()
+    await listener.wait_closed()
+    return replies
+
+def test_malformed_subscribe_is_nacked_and_client_cleaned_up():
+    server = RPI4B_Code.CommandServer(FakeApp())
+
+    async def run():
+        server.loop = asyncio.get_running_loop()
+        # Lebih banyak PING dari MAX_PENDING: antrian harus tetap dikosongkan worker
+        pings = [(PING, 10 + i, None) for i in range(server.MAX_PENDING + 26)]
+        messages = [(HELLO, 1, {"client": "test"}), (SUBSCRIBE, 2, {"threshold": "abc"})] + pings
+        return await asyncio.wait_for(exchange(server, messages, len(messages)), 15)
+
+    # Loop sendiri, bukan asyncio.run: kalau handle_client macet (worker
+    # mati), pembatalan task saat loop ditutup bisa ikut menggantung
+    loop = asyncio.new_event_loop()
+    try:
+        replies = loop.run_until_complete(run())
+    finally:
+        server.executor.shutdown(wait=False)
+        loop.close()
+
+    assert replies[0].type == HELLO_ACK
+    assert replies[1].type == NACK and replies[1].payload["ack"] == 2
+    assert [m.type for m in replies[2:]] == [PONG] * (server.MAX_PENDING + 26)
+    assert not server.clients
+    assert not server.subscribers
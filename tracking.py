@@ -0,0 +1,173 @@
+import time
+
+import numpy as np
+
+# ================= IOU TRACKER =================
+class Track:
+    __slots__ = ("id", "box", "hits", "misses", "votes", "confirmed", "category")
+
+    def __init__(self, track_id, box, category):
+        self.id = track_id
+        self.box = box
+        self.hits = 1
+        self.misses = 0
+        self.votes = {category: 1}
+        self.confirmed = False
+        self.category = category
+
+def iou_matrix(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+# Mencocokkan deteksi antar frame dengan IoU (cadangan: jarak centroid),
+# lalu sebuah item dianggap "terkonfirmasi" setelah terlihat dengan
+# kategori yang sama di confirm_frames frame. Setiap track hanya
+# dikonfirmasi sekali, jadi satu item fisik = satu perintah BUKA.
+class IouTracker:
+    def __init__(self, iou_threshold=0.3, confirm_frames=3, max_misses=5, center_ratio=0.5):
+        self.iou_threshold = iou_threshold
+        self.confirm_frames = confirm_frames
+        self.max_misses = max_misses
+        self.center_ratio = center_ratio
+        self.tracks = []
+        self.next_id = 1
+
+    def _match(self, boxes):
+        if not self.tracks or not len(boxes):
+            return []
+        track_boxes = np.array([t.box for t in self.tracks], dtype=np.float32)
+        ious = iou_matrix(track_boxes, boxes)
+        pairs, used_t, used_d = [], set(), set()
+        for flat in np.argsort(-ious, axis=None):
+            ti, di = divmod(int(flat), ious.shape[1])
+            if ious[ti, di] < self.iou_threshold:
+                break
+            if ti in used_t or di in used_d:
+                continue
+            pairs.append((ti, di))
+            used_t.add(ti)
+            used_d.add(di)
+        # Cadangan centroid untuk item yang bergerak cepat (IoU kecil)
+        for ti, t in enumerate(self.tracks):
+            if ti in used_t:
+                continue
+            tb = track_boxes[ti]
+            center = (tb[:2] + tb[2:]) / 2
+            limit = max(tb[2] - tb[0], tb[3] - tb[1]) * self.center_ratio
+            best, best_dist = None, limit
+            for di in range(len(boxes)):
+                if di in used_d:
+                    continue
+                dist = float(np.linalg.norm((boxes[di, :2] + boxes[di, 2:]) / 2 - center))
+                if dist < best_dist:
+                    best, best_dist = di, dist
+            if best is not None:
+                pairs.append((ti, best))
+                used_t.add(ti)
+                used_d.add(best)
+        return pairs
+
+    def update(self, detections):
+        if len(detections):
+            boxes = detections.xyxy.astype(np.float32)
+            categories = detections.category.tolist()
+        else:
+            boxes = np.zeros((0, 4), dtype=np.float32)
+            categories = []
+        pairs = self._match(boxes)
+        matched_t = {ti for ti, _ in pairs}
+        matched_d = {di for _, di in pairs}
+        for ti, di in pairs:
+            t = self.tracks[ti]
+            t.box = boxes[di]
+            t.hits += 1
+            t.misses = 0
+            t.votes[categories[di]] = t.votes.get(categories[di], 0) + 1
+        for ti, t in enumerate(self.tracks):
+            if ti not in matched_t:
+                t.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for di in range(len(boxes)):
+            if di not in matched_d:
+                self.tracks.append(Track(self.next_id, boxes[di], categories[di]))
+                self.next_id += 1
+
+        confirmed = []
+        for t in self.tracks:
+            if t.confirmed or t.misses:
+                continue
+            category, votes = max(t.votes.items(), key=lambda kv: kv[1])
+            if votes >= self.confirm_frames:
+                t.confirmed = True
+                t.category = category
+                confirmed.append(t)
+        return confirmed
+
+    def region(self, shape, pad=0.25):
+        # Gabungan semua box track aktif + margin, dipakai sebagai crop
+        boxes = np.array([t.box for t in self.tracks], dtype=np.float32)
+        x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+        x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+        mx, my = (x2 - x1) * pad + 16, (y2 - y1) * pad + 16
+        h, w = shape[:2]
+        return (int(max(0, x1 - mx)), int(max(0, y1 - my)),
+                int(min(w, x2 + mx)), int(min(h, y2 + my)))
+
+# ================= TRACK MANAGER =================
+# Satu tracker per kamera. Di antara full-frame refresh, detektor hanya
+# dijalankan pada area track aktif (lihat plan()).
+class TrackManager:
+    def __init__(self, confirm_frames=3, iou_threshold=0.3, max_misses=5,
+                 refresh_every=5, region_pad=0.25, cross_camera_window=2.0):
+        self.confirm_frames = confirm_frames
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.refresh_every = refresh_every
+        self.region_pad = region_pad
+        self.cross_camera_window = cross_camera_window
+        self.trackers = {}
+        self.frame_count = 0
+        self.recent = {}
+
+    def _tracker(self, index):
+        tracker = self.trackers.get(index)
+        if tracker is None:
+            tracker = IouTracker(self.iou_threshold, self.confirm_frames, self.max_misses)
+            self.trackers[index] = tracker
+        return tracker
+
+    def plan(self, frames):
+        # None = jalankan detektor di full frame, tuple = crop (x1, y1, x2, y2)
+        self.frame_count += 1
+        full = self.refresh_every <= 1 or self.frame_count % self.refresh_every == 1
+        regions = []
+        for i, frame in enumerate(frames):
+            tracker = self.trackers.get(i)
+            if full or tracker is None or not tracker.tracks:
+                regions.append(None)
+            else:
+                regions.append(tracker.region(frame.shape, self.region_pad))
+        return regions
+
+    def update(self, detections_list):
+        now = time.monotonic()
+        multi = len(detections_list) > 1
+        events = []
+        for i, detections in enumerate(detections_list):
+            for track in self._tracker(i).update(detections):
+                jenis = detections.categories[track.category].lower()
+                # Item yang sama terlihat dari kamera lain: jangan kirim dua kali
+                if multi and now - self.recent.get(jenis, float("-inf")) < self.cross_camera_window:
+                    continue
+                self.recent[jenis] = now
+                events.append(jenis)
+        return events
+
+    def active(self):
+        return sum(len(t.tracks) for t in self.trackers.values())